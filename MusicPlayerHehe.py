@@ -1,468 +1,3665 @@
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-import pygame
-from collections import deque
-import os
-import threading
-import time
-import math
-from PIL import Image, ImageTk, ImageSequence   # for GIF support
-
-
-class MusicPlayerGUI:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("My Music Playlist")
-        self.root.geometry("800x600")
-        self.root.configure(bg='#0a0a0a')
-        
-        self.animation_speed = 50
-        self.hover_animations = {}
-        self.pulse_phase = 0
-        self.loading_angle = 0
-
-        self.audio_available = True
-        try:
-            pygame.mixer.init()
-        except Exception as e:
-            self.audio_available = False
-            print("Warning: pygame.mixer.init() failed:", e)
-
-        self.music_queue = deque()
-        self.current_song = None
-        self.is_playing = False
-        self.is_paused = False
-
-        # for GIF
-        self.spinner_frames = []
-        self.spinner_index = 0
-
-        self.setup_ui()
-        self.load_spinner_gif("nailong.gif")  # load your gif
-        self.start_animations()
-        self.check_playback_status()
-        
-    def setup_ui(self):
-        main_frame = tk.Frame(self.root, bg='#1a1a2e', relief=tk.FLAT, bd=0)
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
-
-        title_frame = tk.Frame(main_frame, bg='#1a1a2e')
-        title_frame.pack(fill=tk.X, pady=(0, 20))
-
-        self.title_label = tk.Label(title_frame, text="🎵 MY MUSIC PLAYER", 
-                                   font=('Arial', 20, 'bold'), fg='#00ff88', bg='#1a1a2e')
-        self.title_label.pack()
-
-        self.add_music_btn = self.create_animated_button(main_frame, "ADD SONGS", 
-                                                        self.add_music_files, '#ff6b6b', '#ff5252')
-        self.add_music_btn.pack(pady=10)
-
-        current_frame = tk.Frame(main_frame, bg='#16213e', relief=tk.RAISED, bd=2)
-        current_frame.pack(fill=tk.X, padx=10, pady=10)
-        
-        tk.Label(current_frame, text="♪ NOW PLAYING ♪", 
-                font=('Arial', 12, 'bold'), fg='#00ff88', bg='#16213e').pack(pady=(10, 5))
-
-        # Big GIF in the middle like Spotify
-        self.spinner_label = tk.Label(current_frame, bg='#16213e')
-        self.spinner_label.pack(pady=20)
-
-        self.current_song_label = tk.Label(current_frame, text="No song selected", 
-                                          font=('Arial', 11), fg='#ffffff', bg='#16213e',
-                                          wraplength=400)
-        self.current_song_label.pack(pady=(0, 10))
-
-        control_frame = tk.Frame(main_frame, bg='#1a1a2e')
-        control_frame.pack(pady=20)
-        
-        self.play_btn = self.create_animated_button(control_frame, "▶️ PLAY", 
-                                                   self.play_pause_music, '#4CAF50', '#45a049')
-        self.play_btn.pack(side=tk.LEFT, padx=5)
-        
-        self.stop_btn = self.create_animated_button(control_frame, "⏹️ STOP", 
-                                                   self.stop_music, '#f44336', '#da190b')
-        self.stop_btn.pack(side=tk.LEFT, padx=5)
-        
-        self.next_btn = self.create_animated_button(control_frame, "⏭️ NEXT", 
-                                                   self.next_song, '#FF9800', '#F57C00')
-        self.next_btn.pack(side=tk.LEFT, padx=5)
-
-        volume_frame = tk.Frame(main_frame, bg='#1a1a2e')
-        volume_frame.pack(pady=10)
-        
-        tk.Label(volume_frame, text="🔊 VOLUME", font=('Arial', 10, 'bold'), 
-                fg='#ffffff', bg='#1a1a2e').pack(side=tk.LEFT, padx=(0, 10))
-        
-        self.volume_var = tk.DoubleVar(value=70)
-        self.volume_scale = tk.Scale(volume_frame, from_=0, to=100, orient=tk.HORIZONTAL,
-                                    variable=self.volume_var, command=self.change_volume,
-                                    bg='#2d2d2d', fg='#ffffff', highlightthickness=0,
-                                    troughcolor='#404040', activebackground='#00ff88')
-        self.volume_scale.pack(side=tk.LEFT)
-
-        queue_frame = tk.Frame(main_frame, bg='#16213e', relief=tk.RAISED, bd=2)
-        queue_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        queue_header = tk.Frame(queue_frame, bg='#16213e')
-        queue_header.pack(fill=tk.X, pady=10)
-        
-        tk.Label(queue_header, text="🎼 QUEUE", font=('Arial', 12, 'bold'), 
-                fg='#00ff88', bg='#16213e').pack(side=tk.LEFT, padx=20)
-        
-        self.queue_count_label = tk.Label(queue_header, text="(0 songs)", 
-                                         font=('Arial', 10), fg='#cccccc', bg='#16213e')
-        self.queue_count_label.pack(side=tk.LEFT, padx=10)
-
-        queue_list_frame = tk.Frame(queue_frame, bg='#16213e')
-        queue_list_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
-        
-        self.queue_listbox = tk.Listbox(queue_list_frame, bg='#2d2d2d', fg='#ffffff',
-                                       selectbackground='#00ff88', selectforeground='#000000',
-                                       font=('Arial', 10), relief=tk.FLAT, bd=0,
-                                       highlightthickness=0, activestyle='none')
-        
-        queue_scrollbar = tk.Scrollbar(queue_list_frame, orient=tk.VERTICAL, 
-                                      bg='#2d2d2d', troughcolor='#1a1a1a')
-        
-        self.queue_listbox.config(yscrollcommand=queue_scrollbar.set)
-        queue_scrollbar.config(command=self.queue_listbox.yview)
-        
-        self.queue_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        queue_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        queue_btn_frame = tk.Frame(queue_frame, bg='#16213e')
-        queue_btn_frame.pack(pady=(0, 15))
-        
-        self.remove_btn = self.create_animated_button(queue_btn_frame, "REMOVE", 
-                                                     self.remove_selected, '#e74c3c', '#c0392b')
-        self.remove_btn.pack(side=tk.LEFT, padx=5)
-        
-        self.clear_btn = self.create_animated_button(queue_btn_frame, "CLEAR ALL", 
-                                                    self.clear_queue, '#95a5a6', '#7f8c8d')
-        self.clear_btn.pack(side=tk.LEFT, padx=5)
-        
-        self.peek_btn = self.create_animated_button(queue_btn_frame, "PEEK QUEUE", 
-                                                   self.peek_queue, '#3498db', '#2980b9')
-        self.peek_btn.pack(side=tk.LEFT, padx=5)
-
-        self.loading_frame = tk.Frame(main_frame, bg='#1a1a2e')
-        self.loading_label = tk.Label(self.loading_frame, text="⟳ Loading...", 
-                                     font=('Arial', 12), fg='#00ff88', bg='#1a1a2e')
-        self.loading_label.pack()
-        
-        if not self.audio_available:
-            self.play_btn.config(state=tk.DISABLED)
-            self.stop_btn.config(state=tk.DISABLED)
-            self.next_btn.config(state=tk.DISABLED)
-    
-    def create_animated_button(self, parent, text, command, color1, color2):
-        btn = tk.Button(parent, text=text, command=command,
-                       bg=color1, fg='white', font=('Arial', 10, 'bold'),
-                       relief=tk.FLAT, padx=20, pady=8, cursor='hand2',
-                       borderwidth=0, highlightthickness=0)
-        btn.original_color = color1
-        btn.hover_color = color2
-        btn.current_color = color1
-        btn.bind("<Enter>", lambda e: self.start_hover_animation(btn, True))
-        btn.bind("<Leave>", lambda e: self.start_hover_animation(btn, False))
-        return btn
-    
-    def start_hover_animation(self, button, entering):
-        target_color = button.hover_color if entering else button.original_color
-        button.current_color = target_color
-        button.config(bg=target_color)
-    
-    def start_animations(self):
-        self.animate_title()
-        self.animate_spinner()
-        self.animate_loading()
-    
-    def animate_title(self):
-        self.pulse_phase += 0.1
-        intensity = int(128 + 127 * math.sin(self.pulse_phase))
-        color = f"#{intensity:02x}ff88"
-        self.title_label.config(fg=color)
-        self.root.after(100, self.animate_title)
-
-    # -------------------- GIF spinner --------------------
-    def load_spinner_gif(self, nailong_gif):
-        try:
-            gif = Image.open(nailong_gif)
-            frames = []
-            for frame in ImageSequence.Iterator(gif):
-                f = frame.convert("RGBA").copy()
-                f = f.resize((120, 120), Image.Resampling.LANCZOS)  # Spotify-like big GIF
-                frames.append(ImageTk.PhotoImage(f))
-            if frames:
-                self.spinner_frames = frames
-                self.spinner_index = 0
-            else:
-                self.spinner_frames = []
-        except Exception as e:
-            print("Could not load GIF:", e)
-            self.spinner_frames = []
-
-    def animate_spinner(self):
-        if self.spinner_frames and self.is_playing and not self.is_paused:
-            frame = self.spinner_frames[self.spinner_index]
-            self.spinner_label.config(image=frame, text="")
-            self.spinner_index = (self.spinner_index + 1) % len(self.spinner_frames)
-            delay = 80
-            self.root.after(delay, self.animate_spinner)
-            return
-        else:
-            icon = "⏸️" if self.is_paused else "⏹️"
-            self.spinner_label.config(image="", text=icon, font=('Arial', 30), fg='#cccccc')
-        self.root.after(150, self.animate_spinner)
-    # -----------------------------------------------------
-
-    def animate_loading(self):
-        self.loading_angle += 30
-        if self.loading_angle >= 360:
-            self.loading_angle = 0
-        rotation_chars = ['⟳', '⟲', '⟳', '⟲']
-        char_index = (self.loading_angle // 90) % len(rotation_chars)
-        self.loading_label.config(text=f"{rotation_chars[char_index]} Loading...")
-        self.root.after(200, self.animate_loading)
-    
-    def show_loading(self, show=True):
-        if show:
-            self.loading_frame.pack(pady=10)
-        else:
-            self.loading_frame.pack_forget()
-    
-    def add_music_files(self):
-        self.show_loading(True)
-        
-        def load_files():
-            file_types = [
-                ("Audio Files", "*.mp3 *.wav *.ogg *.m4a"),
-                ("All Files", "*.*")
-            ]
-            files = filedialog.askopenfilenames(title="Select Music", filetypes=file_types)
-            if files:
-                for file in files:
-                    self.music_queue.append(file)
-                time.sleep(0.5)
-                self.root.after(0, lambda: [
-                    self.update_queue_display(),
-                    self.show_loading(False),
-                    messagebox.showinfo("Success", f"Added {len(files)} music file(s) to queue!")
-                ])
-            else:
-                self.root.after(0, lambda: self.show_loading(False))
-        threading.Thread(target=load_files, daemon=True).start()
-    
-    def update_queue_display(self):
-        self.queue_listbox.delete(0, tk.END)
-        for i, song in enumerate(self.music_queue, 1):
-            song_name = os.path.basename(song)
-            display_text = f"{i:02d}. {song_name}"
-            self.queue_listbox.insert(tk.END, display_text)
-        count = len(self.music_queue)
-        self.queue_count_label.config(text=f"({count} song{'s' if count != 1 else ''})")
-        self.queue_count_label.config(fg='#00ff88' if count > 0 else '#cccccc')
-    
-    def change_volume(self, value):
-        if self.audio_available:
-            volume = float(value) / 100
-            pygame.mixer.music.set_volume(volume)
-    
-    def peek_queue(self):
-        if not self.music_queue:
-            messagebox.showinfo("No Songs", "The queue is empty!")
-            return
-        peek_window = tk.Toplevel(self.root)
-        peek_window.title("🔍 Peek Queue")
-        peek_window.geometry("500x400")
-        peek_window.configure(bg='#1a1a2e')
-        peek_window.transient(self.root)
-        peek_window.grab_set()
-        peek_window.attributes('-alpha', 0.0)
-        self.fade_in_window(peek_window)
-        header_frame = tk.Frame(peek_window, bg="#252b3d", height=60)
-        header_frame.pack(fill=tk.X, padx=10, pady=10)
-        header_frame.pack_propagate(False)
-        tk.Label(header_frame, text="🎼 QUEUE BROWSER", 
-                font=('Arial', 14, 'bold'), fg='#00ff88', bg='#16213e').pack(pady=15)
-        listbox_frame = tk.Frame(peek_window, bg='#1a1a2e')
-        listbox_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
-        listbox = tk.Listbox(listbox_frame, bg='#2d2d2d', fg='#ffffff',
-                            selectbackground='#00ff88', selectforeground='#000000',
-                            font=('Arial', 11), relief=tk.FLAT, bd=0,
-                            highlightthickness=0, activestyle='none')
-        scrollbar = tk.Scrollbar(listbox_frame, orient=tk.VERTICAL,
-                                bg='#2d2d2d', troughcolor='#1a1a1a')
-        listbox.config(yscrollcommand=scrollbar.set)
-        scrollbar.config(command=listbox.yview)
-        listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        for i, song in enumerate(self.music_queue, 1):
-            song_name = os.path.basename(song)
-            display_text = f"{i:02d}. ♪ {song_name}"
-            listbox.insert(tk.END, display_text)
-        instruction_frame = tk.Frame(peek_window, bg='#16213e')
-        instruction_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
-        tk.Label(instruction_frame, text="💡 Double-click a song to play it directly", 
-                font=('Arial', 10), fg='#cccccc', bg='#16213e').pack(pady=10)
-        def on_double_click(event):
-            selection = listbox.curselection()
-            if selection:
-                index = selection[0]
-                self.play_selected_from_queue(index)
-                self.fade_out_window(peek_window)
-        listbox.bind("<Double-Button-1>", on_double_click)
-    
-    def fade_in_window(self, window, alpha=0.0):
-        alpha += 0.1
-        window.attributes('-alpha', alpha)
-        if alpha < 1.0:
-            self.root.after(50, lambda: self.fade_in_window(window, alpha))
-    
-    def fade_out_window(self, window, alpha=1.0):
-        alpha -= 0.1
-        window.attributes('-alpha', alpha)
-        if alpha > 0.0:
-            self.root.after(50, lambda: self.fade_out_window(window, alpha))
-        else:
-            window.destroy()
-    
-    def play_selected_from_queue(self, index):
-        if index < 0 or index >= len(self.music_queue):
-            return
-        queue_list = list(self.music_queue)
-        selected_song = queue_list.pop(index)
-        self.music_queue = deque(queue_list)
-        self.stop_music()
-        try:
-            pygame.mixer.music.load(selected_song)
-            pygame.mixer.music.play()
-            self.is_playing = True
-            self.is_paused = False
-            self.play_btn.config(text="⏸️ PAUSE")
-            song_name = os.path.basename(selected_song)
-            self.current_song_label.config(text=song_name, fg='#00ff88')
-            self.current_song = selected_song
-            self.update_queue_display()
-            self.pulse_current_song()
-        except Exception as e:
-            messagebox.showerror("Playback Error", f"Could not play file:\n{selected_song}\n\n{str(e)}")
-    
-    def pulse_current_song(self):
-        if self.is_playing:
-            current_fg = self.current_song_label.cget('fg')
-            self.current_song_label.config(fg='#ffffff' if current_fg == '#00ff88' else '#00ff88')
-            self.root.after(1000, self.pulse_current_song)
-    
-    def play_pause_music(self):
-        if not self.audio_available:
-            messagebox.showwarning("Audio Unavailable", "Audio device not initialized. Playback disabled.")
-            return
-        if not self.music_queue and not self.current_song:
-            messagebox.showwarning("No Music", "Please add music to the queue first!")
-            return
-        if self.is_paused:
-            pygame.mixer.music.unpause()
-            self.is_paused = False
-            self.is_playing = True
-            self.play_btn.config(text="⏸️ PAUSE")
-            self.pulse_current_song()
-        elif self.is_playing:
-            pygame.mixer.music.pause()
-            self.is_paused = True
-            self.is_playing = False
-            self.play_btn.config(text="▶️ PLAY")
-        else:
-            self.play_next_song()
-    
-    def play_next_song(self):
-        if self.music_queue:
-            self.current_song = self.music_queue.popleft()
-            self.update_queue_display()
-            try:
-                pygame.mixer.music.load(self.current_song)
-                pygame.mixer.music.play()
-                self.is_playing = True
-                self.is_paused = False
-                self.play_btn.config(text="⏸️ PAUSE")
-                song_name = os.path.basename(self.current_song)
-                self.current_song_label.config(text=song_name, fg='#00ff88')
-                self.pulse_current_song()
-            except Exception as e:
-                messagebox.showerror("Playback Error", f"Could not play file:\n{self.current_song}\n\n{str(e)}")
-                self.current_song = None
-                self.is_playing = False
-                self.play_btn.config(text="▶️ PLAY")
-                if self.music_queue:
-                    self.play_next_song()
-        else:
-            messagebox.showinfo("Queue Empty", "No more songs in queue!")
-    
-    def stop_music(self):
-        if self.audio_available:
-            pygame.mixer.music.stop()
-        self.is_playing = False
-        self.is_paused = False
-        self.current_song = None
-        self.play_btn.config(text="▶️ PLAY")
-        self.current_song_label.config(text="No song selected", fg='#cccccc')
-    
-    def next_song(self):
-        if self.music_queue:
-            self.stop_music()
-            self.root.after(100, self.play_next_song)
-        else:
-            messagebox.showinfo("Queue Empty", "No more songs in queue!")
-    
-    def remove_selected(self):
-        selection = self.queue_listbox.curselection()
-        if selection:
-            index = selection[0]
-            removed_song = list(self.music_queue)[index]
-            queue_list = list(self.music_queue)
-            queue_list.pop(index)
-            self.music_queue = deque(queue_list)
-            self.update_queue_display()
-            song_name = os.path.basename(removed_song)
-            messagebox.showinfo("Removed", f"♪ Removed: {song_name}")
-        else:
-            messagebox.showwarning("No Selection", "Please select a song to remove!")
-    
-    def clear_queue(self):
-        if self.music_queue:
-            if messagebox.askyesno("Clear Queue", "🗑️ Are you sure you want to clear the entire queue?"):
-                self.music_queue.clear()
-                self.update_queue_display()
-                messagebox.showinfo("Cleared", "✨ Queue cleared!")
-        else:
-            messagebox.showinfo("Empty Queue", "Queue is already empty!")
-    
-    def check_playback_status(self):
-        if self.is_playing and self.audio_available and not pygame.mixer.music.get_busy() and not self.is_paused:
-            if self.music_queue:
-                self.play_next_song()
-            else:
-                self.stop_music()
-        self.root.after(1000, self.check_playback_status)
-
-
-def main():
-    root = tk.Tk()
-    root.resizable(True, True)
-    root.minsize(600, 500)
-    root.update_idletasks()
-    x = (root.winfo_screenwidth() // 2) - (800 // 2)
-    y = (root.winfo_screenheight() // 2) - (600 // 2)
-    root.geometry(f"800x600+{x}+{y}")
-    app = MusicPlayerGUI(root)
-    try:
-        root.mainloop()
-    except KeyboardInterrupt:
-        print("\nApplication closed by user")
-    finally:
-        if app.audio_available:
-            pygame.mixer.quit()
-
-
-if __name__ == "__main__":
-    main()
+import time
+STARTUP_T0 = time.perf_counter()   # --profile-startup measures from here
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+from tkinter import font as tkfont
+from collections import deque, OrderedDict
+import os
+import threading
+import queue
+import math
+import csv
+import functools
+import json
+import argparse
+import random
+import sys
+import struct
+import hashlib
+import mmap
+import zlib
+import sqlite3
+import wave
+from array import array
+import bisect
+import itertools
+import multiprocessing
+import socket
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+import importlib.util
+# pygame, PIL (for GIF support), numpy, mutagen and asyncio are imported
+# where they're first needed, so the window can paint before they've loaded.
+HAVE_MUTAGEN = importlib.util.find_spec("mutagen") is not None   # optional, for tags and durations
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None   # optional, for loudness analysis
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "music-player")
+SESSION_PATH = os.path.join(CACHE_DIR, "session.txt")
+PLAYLIST_EXTENSIONS = {".m3u", ".m3u8"}
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".ogg", ".m4a"}
+PROFILE_STARTUP = False
+startup_last = STARTUP_T0
+
+
+def startup_mark(label, since=None):
+    # --profile-startup: how long a step took and when it finished. Steps on
+    # other threads pass their own start time.
+    global startup_last
+    if not PROFILE_STARTUP:
+        return
+    now = time.perf_counter()
+    if since is None:
+        since, startup_last = startup_last, now
+    print(f"startup | {label:<24}{(now - since) * 1e3:9.1f} ms   done at {(now - STARTUP_T0) * 1e3:9.1f} ms")
+
+
+# -------------------- queue model --------------------
+class TrackQueue:
+    # Chunked list with a Fenwick tree over the chunk sizes, so positional
+    # lookup, remove, insert and move cost O(log n) plus a bounded memmove
+    # inside one chunk instead of copying the whole queue.
+    CHUNK_SIZE = 512
+
+    def __init__(self, items=()):
+        self._chunks = []
+        self._tree = [0]
+        self._step = 0
+        self._len = 0
+        self.extend(items)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self.islice(start, stop))
+        chunk_index, offset = self._locate(index)
+        return self._chunks[chunk_index][offset]
+
+    def _rebuild_tree(self):
+        count = len(self._chunks)
+        tree = [0] + [len(chunk) for chunk in self._chunks]
+        for i in range(1, count + 1):
+            parent = i + (i & -i)
+            if parent <= count:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._step = 1 << (count.bit_length() - 1) if count else 0
+
+    def _update_tree(self, chunk_index, delta):
+        i = chunk_index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _normalize(self, index):
+        if index < 0:
+            index += self._len
+        if index < 0 or index >= self._len:
+            raise IndexError("queue index out of range")
+        return index
+
+    def _locate(self, index):
+        pos = self._normalize(index)
+        chunk_index = 0
+        step = self._step
+        while step:
+            nxt = chunk_index + step
+            if nxt < len(self._tree) and self._tree[nxt] <= pos:
+                chunk_index = nxt
+                pos -= self._tree[nxt]
+            step >>= 1
+        return chunk_index, pos
+
+    def islice(self, start=0, stop=None):
+        stop = self._len if stop is None else min(stop, self._len)
+        if start >= stop:
+            return
+        chunk_index, offset = self._locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = self._chunks[chunk_index]
+            part = chunk[offset:offset + remaining]
+            yield from part
+            remaining -= len(part)
+            chunk_index += 1
+            offset = 0
+
+    def append(self, item):
+        if self._chunks and len(self._chunks[-1]) < self.CHUNK_SIZE:
+            self._chunks[-1].append(item)
+            self._update_tree(len(self._chunks) - 1, 1)
+        else:
+            self._chunks.append([item])
+            self._rebuild_tree()
+        self._len += 1
+
+    def extend(self, items):
+        added = 0
+        for item in items:
+            if not self._chunks or len(self._chunks[-1]) >= self.CHUNK_SIZE:
+                self._chunks.append([])
+            self._chunks[-1].append(item)
+            added += 1
+        if added:
+            self._len += added
+            self._rebuild_tree()
+
+    def insert(self, index, item):
+        if index < 0:
+            index = max(0, index + self._len)
+        if index >= self._len:
+            self.append(item)
+            return
+        chunk_index, offset = self._locate(index)
+        chunk = self._chunks[chunk_index]
+        chunk.insert(offset, item)
+        self._len += 1
+        if len(chunk) > 2 * self.CHUNK_SIZE:
+            half = len(chunk) // 2
+            self._chunks[chunk_index:chunk_index + 1] = [chunk[:half], chunk[half:]]
+            self._rebuild_tree()
+        else:
+            self._update_tree(chunk_index, 1)
+
+    def pop(self, index=-1):
+        if not self._len:
+            raise IndexError("pop from an empty queue")
+        chunk_index, offset = self._locate(index)
+        chunk = self._chunks[chunk_index]
+        item = chunk.pop(offset)
+        self._len -= 1
+        if chunk:
+            self._update_tree(chunk_index, -1)
+        else:
+            del self._chunks[chunk_index]
+            self._rebuild_tree()
+        return item
+
+    def popleft(self):
+        return self.pop(0)
+
+    def index(self, item):
+        offset = 0
+        for chunk in self._chunks:
+            try:
+                return offset + chunk.index(item)
+            except ValueError:
+                offset += len(chunk)
+        raise ValueError(f"{item!r} is not in queue")
+
+    def move(self, src, dst):
+        item = self.pop(src)
+        self.insert(dst, item)
+        return item
+
+    def clear(self):
+        self._chunks = []
+        self._len = 0
+        self._rebuild_tree()
+# -----------------------------------------------------
+
+
+# -------------------- queue view --------------------
+class DisplayNameCache(dict):
+    # Shared by every queue view so each path is formatted once. Metadata
+    # comes from the library index, looked up a whole batch at a time.
+    # Paths found to be unreachable, or to hold the same audio as an
+    # earlier one, are marked.
+    def __init__(self, library=None, unreachable=(), duplicates=()):
+        super().__init__()
+        self.library = library
+        self.unreachable = unreachable
+        self.duplicates = duplicates
+
+    def __missing__(self, path):
+        self.prefetch([path])
+        return self[path]
+
+    def prefetch(self, paths):
+        missing = [path for path in paths if path not in self]
+        if not missing:
+            return
+        info = self.library.lookup_many(missing) if self.library else {}
+        for path in missing:
+            name = format_track_name(path, info.get(path))
+            if path in self.unreachable:
+                name = f"⚠ {name} (missing)"
+            elif path in self.duplicates:
+                name = f"⧉ {name} (duplicate)"
+            self[path] = name
+
+
+class VirtualQueueView:
+    # Listbox that only holds the rows currently on screen. The scrollbar is
+    # driven by hand so it still represents the whole queue.
+    def __init__(self, parent, queue, names, row_format, **listbox_options):
+        self.queue = queue
+        self.names = names
+        self.row_format = row_format
+        self.first = 0
+        self.visible = 1
+        self.rows = []
+        self.selected = None
+
+        self.listbox = tk.Listbox(parent, exportselection=False, **listbox_options)
+        self.scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview,
+                                      bg='#2d2d2d', troughcolor='#1a1a1a')
+        font = tkfont.Font(font=self.listbox.cget('font'))
+        self.line_height = font.metrics('linespace') + 1 + 2 * int(self.listbox.cget('selectborderwidth'))
+
+        self.listbox.bind("<Configure>", self.on_resize)
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        self.listbox.bind("<MouseWheel>", self.on_wheel)
+        self.listbox.bind("<Button-4>", lambda e: self.scroll_to(self.first - 3) or "break")
+        self.listbox.bind("<Button-5>", lambda e: self.scroll_to(self.first + 3) or "break")
+
+    def pack(self):
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def bind(self, sequence, handler):
+        self.listbox.bind(sequence, handler)
+
+    def index_at(self, y):
+        index = self.first + self.listbox.nearest(y)
+        return index if index < len(self.queue) else None
+
+    def selected_index(self):
+        return self.selected
+
+    def on_resize(self, event):
+        self.visible = max(1, event.height // self.line_height)
+        self.render()
+
+    def on_select(self, event):
+        selection = self.listbox.curselection()
+        self.selected = self.first + selection[0] if selection else None
+
+    def on_wheel(self, event):
+        self.scroll_to(self.first + (-3 if event.delta > 0 else 3))
+        return "break"
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.queue)))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self.visible
+            self.scroll_to(self.first + amount)
+
+    def scroll_to(self, first):
+        self.first = first
+        self.render()
+
+    def render(self):
+        total = len(self.queue)
+        self.first = max(0, min(self.first, total - self.visible))
+        paths = self.queue[self.first:self.first + self.visible]
+        self.names.prefetch(paths)
+        rows = [self.row_format.format(index=self.first + i, name=self.names[path])
+                for i, path in enumerate(paths, 1)]
+        # only touch the rows that actually changed
+        for i, row in enumerate(rows):
+            if i >= len(self.rows):
+                self.listbox.insert(tk.END, row)
+            elif self.rows[i] != row:
+                self.listbox.delete(i)
+                self.listbox.insert(i, row)
+        if len(self.rows) > len(rows):
+            self.listbox.delete(len(rows), tk.END)
+        self.rows = rows
+        self.listbox.selection_clear(0, tk.END)
+        if self.selected is not None and self.first <= self.selected < self.first + len(rows):
+            self.listbox.selection_set(self.selected - self.first)
+        self.listbox.yview_moveto(0)
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        total = len(self.queue)
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    # incremental updates, called after the queue itself was changed
+    def refresh(self):
+        self.render()
+
+    def pop_front(self):
+        self.remove_at(0)
+
+    def remove_at(self, index):
+        if self.selected is not None:
+            if self.selected == index:
+                self.selected = None
+            elif self.selected > index:
+                self.selected -= 1
+        if index < self.first:
+            self.first -= 1
+        if index < self.first + self.visible:
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def insert_at(self, index):
+        if self.selected is not None and self.selected >= index:
+            self.selected += 1
+        if index < self.first:
+            self.first += 1
+        if index < self.first + self.visible:
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def append_batch(self, count):
+        if len(self.queue) - count < self.first + self.visible:
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def clear(self):
+        self.first = 0
+        self.selected = None
+        self.render()
+# -----------------------------------------------------
+
+
+# -------------------- spinner frames --------------------
+class SpinnerFrames:
+    # Resized GIF frames, decoded one at a time on first display. Once every
+    # frame has been seen they are written to CACHE_DIR as zlib-compressed
+    # RGBA, keyed by source path, mtime and target size, so the next start
+    # skips the GIF decode and the LANCZOS resize entirely.
+    MAGIC = b"MPSF1"
+    HEADER = struct.Struct("<5sHHI")
+    FRAME = struct.Struct("<II")   # duration in ms, compressed length
+
+    def __init__(self, path, size=(120, 120), cache_dir=CACHE_DIR):
+        self.path = path
+        self.size = size
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}"
+        self.cache_path = os.path.join(cache_dir, f"spinner-{hashlib.sha1(key.encode()).hexdigest()[:16]}.bin")
+        self.images = {}
+        self.gif = None
+        self.from_cache = self.read_cache()
+        if not self.from_cache:
+            from PIL import Image
+            self.gif = Image.open(path)
+            count = getattr(self.gif, "n_frames", 1)
+            self.blobs = [None] * count
+            self.durations = [None] * count
+
+    def __len__(self):
+        return len(self.blobs)
+
+    def __getitem__(self, index):
+        image = self.images.get(index)
+        if image is None:
+            from PIL import ImageTk
+            image = self.images[index] = ImageTk.PhotoImage(self.frame_image(index))
+        return image
+
+    def duration(self, index):
+        return self.durations[index] or 80
+
+    def frame_image(self, index):
+        from PIL import Image
+        blob = self.blobs[index]
+        if blob is not None:
+            return Image.frombytes("RGBA", self.size, zlib.decompress(blob))
+        self.gif.seek(index)
+        self.durations[index] = self.gif.info.get("duration") or 80
+        frame = self.gif.convert("RGBA").resize(self.size, Image.Resampling.LANCZOS)  # Spotify-like big GIF
+        self.blobs[index] = zlib.compress(frame.tobytes(), 1)
+        if all(b is not None for b in self.blobs):
+            self.write_cache()
+        return frame
+
+    def read_cache(self):
+        try:
+            with open(self.cache_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return False
+        try:
+            magic, width, height, count = self.HEADER.unpack_from(data)
+            if magic != self.MAGIC or (width, height) != tuple(self.size):
+                return False
+            offset = self.HEADER.size
+            entries = [self.FRAME.unpack_from(data, offset + i * self.FRAME.size) for i in range(count)]
+        except struct.error:
+            return False
+        offset += count * self.FRAME.size
+        self.durations = []
+        self.blobs = []
+        for duration, length in entries:
+            self.durations.append(duration)
+            self.blobs.append(data[offset:offset + length])
+            offset += length
+        return True
+
+    def write_cache(self):
+        parts = [self.HEADER.pack(self.MAGIC, self.size[0], self.size[1], len(self.blobs))]
+        parts += [self.FRAME.pack(d, len(b)) for d, b in zip(self.durations, self.blobs)]
+        parts += self.blobs
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(b"".join(parts))
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print("Could not write spinner cache:", e)
+        self.gif = None
+# -----------------------------------------------------
+
+
+# -------------------- folder import --------------------
+def sniff_audio(path):
+    try:
+        with open(path, "rb") as f:
+            head = f.read(12)
+    except OSError:
+        return False
+    return (head.startswith((b"ID3", b"OggS", b"fLaC"))
+            or (head.startswith(b"RIFF") and head[8:12] == b"WAVE")
+            or head[4:8] == b"ftyp"
+            or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0))  # MPEG frame sync
+
+
+class FolderImporter:
+    # Walks a directory tree on a thread pool, one task per folder. Candidate
+    # files go back to the pool in chunks to be sniffed, so a big flat folder
+    # is checked in parallel and its first batch shows up while the rest is
+    # still being listed. Matching files are pushed onto a thread-safe queue
+    # in sorted batches; the Tk thread takes them off with drain() so it
+    # never blocks on disk.
+    BATCH_SIZE = 500
+
+    def __init__(self, root_dir, workers=None):
+        self.root_dir = root_dir
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.scanned_dirs = 0
+        self.found = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4))
+
+    def start(self):
+        self.submit(self.scan, self.root_dir)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def finished(self):
+        return self.done.is_set() and self.results.empty()
+
+    def submit(self, task, arg):
+        # only called from start() or a running task, so pending can't hit 0 first
+        with self.lock:
+            self.pending += 1
+        self.executor.submit(task, arg)
+
+    def task_done(self, dirs=0, found=0):
+        with self.lock:
+            self.found += found
+            self.scanned_dirs += dirs
+            self.pending -= 1
+            finished = self.pending == 0
+        if finished:
+            self.done.set()
+            self.executor.shutdown(wait=False)
+
+    def scan(self, directory):
+        chunk = []
+        try:
+            if not self.cancelled.is_set():
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if self.cancelled.is_set():
+                            break
+                        if entry.is_dir(follow_symlinks=False):
+                            self.submit(self.scan, entry.path)
+                        elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS and entry.is_file():
+                            chunk.append(entry.path)
+                            if len(chunk) == self.BATCH_SIZE:
+                                self.submit(self.sniff, chunk)
+                                chunk = []
+        except OSError:
+            pass
+        finally:
+            if chunk:
+                self.submit(self.sniff, chunk)
+            self.task_done(dirs=1)
+
+    def sniff(self, paths):
+        files = []
+        try:
+            if not self.cancelled.is_set():
+                files = sorted(path for path in paths if sniff_audio(path))
+                if files:
+                    self.results.put(files)
+        finally:
+            self.task_done(found=len(files))
+
+    def drain(self, limit):
+        paths = []
+        while len(paths) < limit:
+            try:
+                paths.extend(self.results.get_nowait())
+            except queue.Empty:
+                break
+        return paths
+
+    def progress(self):
+        return f"{self.scanned_dirs} folder(s) scanned"
+# -----------------------------------------------------
+
+
+# -------------------- playlists and sessions --------------------
+def read_m3u(path):
+    # Plain and extended M3U. Relative entries are relative to the playlist;
+    # URLs are skipped. Undecodable bytes survive as surrogates, like os does.
+    folder = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8-sig", errors="surrogateescape") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "://" not in line:
+                yield os.path.normpath(os.path.join(folder, line))
+
+
+def write_m3u(path, paths, library=None, conn=None):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", errors="surrogateescape") as f:
+        f.write("#EXTM3U\n")
+        for start in range(0, len(paths), LibraryIndex.BATCH_SIZE):
+            chunk = paths[start:start + LibraryIndex.BATCH_SIZE]
+            info = library.lookup_many(chunk, conn) if library else {}
+            for track in chunk:
+                title, artist, album, duration = info.get(track) or (None,) * 4
+                f.write(f"#EXTINF:{round(duration) if duration else -1},"
+                        f"{format_track_name(track, (title, artist, album, None))}\n{os.path.abspath(track)}\n")
+    os.replace(tmp_path, path)
+
+
+class PlaylistLoader:
+    # Feeds paths from any iterable (an M3U file, a session journal) to the
+    # Tk thread in batches, with the same start/drain/cancel interface as
+    # FolderImporter. The iterable is consumed on a worker thread.
+    BATCH_SIZE = 500
+
+    def __init__(self, paths, name=""):
+        self.paths = paths
+        self.name = name
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.found = 0
+
+    def start(self):
+        threading.Thread(target=self.read, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def finished(self):
+        return self.done.is_set() and self.results.empty()
+
+    def read(self):
+        batch = []
+        try:
+            for path in self.paths:
+                batch.append(path)
+                if len(batch) == self.BATCH_SIZE:
+                    if self.cancelled.is_set():
+                        return
+                    self.results.put(batch)
+                    self.found += len(batch)
+                    batch = []
+            self.results.put(batch)
+            self.found += len(batch)
+        except OSError as e:
+            print("Could not read", self.name, e)
+        finally:
+            self.done.set()
+
+    def drain(self, limit):
+        paths = []
+        while len(paths) < limit:
+            try:
+                paths.extend(self.results.get_nowait())
+            except queue.Empty:
+                break
+        return paths
+
+    def progress(self):
+        return f"{self.found} read from {self.name}"
+
+
+class QueueSession:
+    # The queue as an append-only journal, so saving after every change is
+    # one small write() instead of rewriting a huge file:
+    #   +N<TAB>suffix   append; N characters are shared with the previous path
+    #   -I              remove the entry at index I
+    #   <I<TAB>path     insert path at index I
+    #   c               clear
+    #   @S<TAB>path     current track, S seconds in
+    # On startup the old journal is moved to .old and replayed on a thread
+    # (restore() returns a PlaylistLoader); the engine's events then write a
+    # fresh, compact journal. The .old file is only removed once the restore
+    # finished, so quitting half way loses nothing.
+    HEADER = "#music-player session 1\n"
+
+    def __init__(self, engine, path=SESSION_PATH):
+        self.engine = engine
+        self.path = path
+        self.old_path = path + ".old"
+        self.file = None
+        self.last_path = ""
+        self.current = None
+
+    def restore(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.old_path):
+            pass   # the last restore never finished; the new journal is partial
+        elif os.path.exists(self.path):
+            os.replace(self.path, self.old_path)
+        self.file = open(self.path, "w", encoding="utf-8", errors="surrogateescape")
+        self.file.write(self.HEADER)
+        self.file.flush()
+        self.engine.subscribe(self.on_engine_event)
+        return PlaylistLoader(self.replay(), "session")
+
+    def replay(self):
+        if not os.path.exists(self.old_path):
+            return
+        tracks = TrackQueue()
+        previous = ""
+        with open(self.old_path, encoding="utf-8", errors="surrogateescape") as f:
+            if f.readline() != self.HEADER:
+                print("Ignoring session file with an unknown format:", self.old_path)
+                return
+            for line in f:
+                line = line.rstrip("\n")
+                op = line[:1]
+                try:
+                    if op == "+":
+                        shared, _, suffix = line[1:].partition("\t")
+                        previous = previous[:int(shared)] + suffix
+                        tracks.append(previous)
+                    elif op == "-":
+                        tracks.pop(int(line[1:]))
+                    elif op == "<":
+                        index, _, path = line[1:].partition("\t")
+                        tracks.insert(int(index), path)
+                    elif op == "c":
+                        tracks.clear()
+                    elif op == "@":
+                        position, _, path = line[1:].partition("\t")
+                        self.current = (path, float(position)) if path else None
+                except (ValueError, IndexError):
+                    pass   # a line cut short by a crash
+        yield from tracks
+
+    def finish_restore(self):
+        try:
+            os.remove(self.old_path)
+        except OSError:
+            pass
+
+    def write(self, text):
+        try:
+            self.file.write(text)
+            self.file.flush()
+        except (OSError, ValueError) as e:
+            print("Could not save session:", e)
+
+    def on_engine_event(self, event, data):
+        if event == "queue_changed":
+            change, args = data["change"], data["args"]
+            if change == "append_batch":
+                lines = []
+                previous = self.last_path
+                for path in self.engine.music_queue[-args[0]:] if args[0] else ():
+                    shared = len(os.path.commonprefix((previous, path)))
+                    lines.append(f"+{shared}\t{path[shared:]}\n")
+                    previous = path
+                self.last_path = previous
+                self.write("".join(lines))
+            elif change == "pop_front":
+                self.write("-0\n")
+            elif change == "remove_at":
+                self.write(f"-{args[0]}\n")
+            elif change == "insert_at":
+                self.write(f"<{args[0]}\t{self.engine.music_queue[args[0]]}\n")
+            elif change == "clear":
+                self.write("c\n")
+        elif event == "track_changed":
+            self.save_position()
+
+    def save_position(self):
+        self.write(f"@{self.engine.position():.1f}\t{self.engine.current_song or ''}\n")
+
+    def close(self):
+        if self.file is not None:
+            self.save_position()
+            self.file.close()
+            self.file = None
+# -----------------------------------------------------
+
+
+# -------------------- library index --------------------
+def read_track_metadata(path):
+    # runs on the library scan thread, so the import never holds up Tk
+    title = artist = album = duration = None
+    if HAVE_MUTAGEN:
+        import mutagen
+        try:
+            audio = mutagen.File(path, easy=True)
+        except Exception:
+            audio = None
+        if audio is not None:
+            duration = getattr(audio.info, "length", None)
+            title = (audio.get("title") or [None])[0]
+            artist = (audio.get("artist") or [None])[0]
+            album = (audio.get("album") or [None])[0]
+    elif path.lower().endswith(".wav"):
+        try:
+            with wave.open(path) as w:
+                duration = w.getnframes() / w.getframerate()
+        except (wave.Error, OSError, EOFError):
+            pass
+    return title, artist, album, duration
+
+
+def format_track_name(path, info):
+    if not info or not info[0]:
+        name = os.path.basename(path)
+    else:
+        title, artist = info[0], info[1]
+        name = f"{artist} - {title}" if artist else title
+    if info and info[3]:
+        minutes, seconds = divmod(int(info[3]), 60)
+        name += f" ({minutes}:{seconds:02d})"
+    return name
+
+
+class LibraryIndex:
+    # Parsed tags and durations in a local SQLite file, keyed by path and
+    # validated by size + mtime so a rescan only reparses changed files.
+    # Scanning runs on its own thread with its own connection; the paths it
+    # refreshed come back through drain_updates(), the ones it couldn't
+    # stat through drain_missing().
+    SCHEMA = """CREATE TABLE IF NOT EXISTS tracks (
+        path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,
+        title TEXT, artist TEXT, album TEXT, duration REAL)"""
+    BATCH_SIZE = 500
+
+    def __init__(self, db_path=os.path.join(CACHE_DIR, "library.sqlite3")):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = self.connect()
+        with self.conn:
+            self.conn.execute(self.SCHEMA)
+        self.pending = queue.Queue()
+        self.updates = queue.Queue()
+        self.missing = queue.Queue()
+        threading.Thread(target=self.scan_worker, daemon=True).start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def scan_async(self, paths):
+        self.pending.put(list(paths))
+
+    def scan_worker(self):
+        conn = self.connect()
+        while True:
+            paths = self.pending.get()
+            for start in range(0, len(paths), self.BATCH_SIZE):
+                try:
+                    self.scan_batch(conn, paths[start:start + self.BATCH_SIZE])
+                except sqlite3.Error as e:
+                    print("Library scan failed:", e)
+
+    def scan_batch(self, conn, paths):
+        placeholders = ",".join("?" * len(paths))
+        known = {path: (size, mtime) for path, size, mtime in conn.execute(
+            f"SELECT path, size, mtime_ns FROM tracks WHERE path IN ({placeholders})", paths)}
+        rows = {}
+        missing = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                missing.append(path)
+                continue
+            if path in rows or known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            rows[path] = (path, stat.st_size, stat.st_mtime_ns, *read_track_metadata(path))
+        if rows:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)", rows.values())
+            self.updates.put(list(rows))
+        if missing:
+            self.missing.put(missing)
+
+    def lookup_many(self, paths, conn=None):
+        # conn: a connection of the calling thread's own, off the Tk thread
+        result = {}
+        for start in range(0, len(paths), self.BATCH_SIZE):
+            chunk = paths[start:start + self.BATCH_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for path, *info in (conn or self.conn).execute(
+                    f"SELECT path, title, artist, album, duration FROM tracks WHERE path IN ({placeholders})", chunk):
+                result[path] = tuple(info)
+        return result
+
+    def drain_updates(self):
+        return self.drain(self.updates)
+
+    def drain_missing(self):
+        return self.drain(self.missing)
+
+    def drain(self, results):
+        paths = []
+        while True:
+            try:
+                paths.extend(results.get_nowait())
+            except queue.Empty:
+                return paths
+# -----------------------------------------------------
+
+
+# -------------------- loudness --------------------
+LOUDNESS_TARGET_DB = -18.0
+
+
+def init_loudness_worker():
+    # worker processes decode through SDL but never play anything
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    import pygame
+    pygame.mixer.init(44100, -16, 2)
+
+
+def analyze_loudness(path):
+    # ReplayGain-style: 95th percentile of 50 ms RMS blocks, relative to
+    # LOUDNESS_TARGET_DB. Runs in a worker process.
+    import pygame
+    import numpy as np
+    samples = pygame.sndarray.array(pygame.mixer.Sound(path))
+    if np.issubdtype(samples.dtype, np.integer):
+        samples = samples.astype(np.float32) / np.iinfo(samples.dtype).max
+    else:
+        samples = samples.astype(np.float32)
+    power = (samples ** 2).mean(axis=1) if samples.ndim > 1 else samples ** 2
+    block = int(pygame.mixer.get_init()[0] * 0.05)
+    blocks = len(power) // block
+    if blocks:
+        power = power[:blocks * block].reshape(blocks, block).mean(axis=1)
+    loudness = 10 * math.log10(float(np.percentile(power, 95)) + 1e-10) if len(power) else -100.0
+    peak = float(np.abs(samples).max()) if samples.size else 0.0
+    return LOUDNESS_TARGET_DB - loudness, peak
+
+
+class LoudnessAnalyzer:
+    # Computes per-track gain and peak in a process pool (spawned, so the
+    # workers don't inherit our open audio device) and caches them in the
+    # library database, keyed by size + mtime like the tags. One dispatcher
+    # thread owns the SQLite connection; results reach the engine through
+    # drain().
+    SCHEMA = """CREATE TABLE IF NOT EXISTS loudness (
+        path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, gain_db REAL, peak REAL)"""
+    BATCH_SIZE = 500
+
+    def __init__(self, db_path, workers=None):
+        self.db_path = db_path
+        self.pending = queue.Queue()
+        self.results = queue.Queue()
+        self.seen = set()
+        self.executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                            mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=init_loudness_worker)
+        threading.Thread(target=self.dispatch, daemon=True).start()
+
+    def submit(self, paths):
+        self.pending.put(list(paths))
+
+    def shutdown(self):
+        self.pending.put(None)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def dispatch(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        with conn:
+            conn.execute(self.SCHEMA)
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            try:
+                if isinstance(item, tuple):
+                    self.store(conn, *item)
+                else:
+                    for start in range(0, len(item), self.BATCH_SIZE):
+                        self.lookup(conn, item[start:start + self.BATCH_SIZE])
+            except sqlite3.Error as e:
+                print("Loudness cache failed:", e)
+
+    def lookup(self, conn, paths):
+        paths = [path for path in dict.fromkeys(paths) if path not in self.seen]
+        self.seen.update(paths)
+        if not paths:
+            return
+        placeholders = ",".join("?" * len(paths))
+        known = {path: row for path, *row in conn.execute(
+            f"SELECT path, size, mtime_ns, gain_db, peak FROM loudness WHERE path IN ({placeholders})", paths)}
+        cached = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            row = known.get(path)
+            if row and (row[0], row[1]) == (stat.st_size, stat.st_mtime_ns):
+                cached[path] = (row[2], row[3])
+                continue
+            future = self.executor.submit(analyze_loudness, path)
+            future.add_done_callback(
+                lambda f, path=path, stat=stat: self.pending.put((path, stat.st_size, stat.st_mtime_ns, f)))
+        if cached:
+            self.results.put(cached)
+
+    def store(self, conn, path, size, mtime_ns, future):
+        if future.cancelled():
+            return
+        try:
+            gain_db, peak = future.result()
+        except Exception as e:
+            print("Could not analyze", path, e)
+            return
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO loudness VALUES (?, ?, ?, ?, ?)",
+                         (path, size, mtime_ns, gain_db, peak))
+        self.results.put({path: (gain_db, peak)})
+
+    def drain(self):
+        gains = {}
+        while True:
+            try:
+                gains.update(self.results.get_nowait())
+            except queue.Empty:
+                return gains
+# -----------------------------------------------------
+
+
+# -------------------- duplicates --------------------
+HASH_CHUNK = 1 << 20
+HASH_BATCH = 64   # files per worker task, so 100k small files aren't 100k round trips
+
+
+def audio_payload(data):
+    # (start, end) of the audio itself: ID3v2 at the front and ID3v1/APEv2
+    # at the back are left out, so a retagged copy hashes the same
+    start, end = 0, len(data)
+    while end - start >= 10 and data[start:start + 3] == b"ID3":
+        flags = data[start + 5]
+        size = 0
+        for byte in data[start + 6:start + 10]:
+            size = size << 7 | byte & 0x7f
+        start = min(end, start + 10 + size + (10 if flags & 0x10 else 0))
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    if end - start >= 32 and data[end - 32:end - 24] == b"APETAGEX":
+        size, _, flags = struct.unpack("<III", data[end - 20:end - 8])
+        end = max(start, end - size - (32 if flags & 0x80000000 else 0))
+    return start, end
+
+
+def hash_audio(path):
+    # Streams the payload through blake2b from a memory map, one chunk at a
+    # time, so only the pages being hashed are ever resident. Files with no
+    # audio left after the tags get no digest; they'd all match each other.
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        if not stat.st_size:
+            return stat.st_size, stat.st_mtime_ns, None
+        digest = hashlib.blake2b(digest_size=16)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, memoryview(data) as view:
+            start, end = audio_payload(data)
+            for offset in range(start, end, HASH_CHUNK):
+                digest.update(view[offset:min(end, offset + HASH_CHUNK)])
+    return stat.st_size, stat.st_mtime_ns, digest.hexdigest() if end > start else None
+
+
+def hash_audio_files(paths):
+    # runs in a worker process; unreadable files are left out
+    hashes = []
+    for path in paths:
+        try:
+            hashes.append((path, *hash_audio(path)))
+        except (OSError, ValueError):
+            pass
+    return hashes
+
+
+class DuplicateDetector:
+    # Content hashes of the audio payload, computed in a process pool and
+    # cached in the library database by size + mtime. Built like
+    # LoudnessAnalyzer: a dispatcher thread owns the SQLite connection and
+    # drain() hands {path: digest} to the engine.
+    SCHEMA = """CREATE TABLE IF NOT EXISTS hashes (
+        path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)"""
+    BATCH_SIZE = 500
+
+    def __init__(self, db_path, workers=None):
+        self.db_path = db_path
+        self.workers = workers or os.cpu_count()
+        self.pending = queue.Queue()
+        self.results = queue.Queue()
+        self.seen = set()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        threading.Thread(target=self.dispatch, daemon=True).start()
+
+    def submit(self, paths):
+        self.pending.put(list(paths))
+
+    def shutdown(self):
+        self.pending.put(None)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def dispatch(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        with conn:
+            conn.execute(self.SCHEMA)
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            try:
+                if isinstance(item, Future):
+                    self.store(conn, item)
+                else:
+                    for start in range(0, len(item), self.BATCH_SIZE):
+                        self.lookup(conn, item[start:start + self.BATCH_SIZE])
+            except sqlite3.Error as e:
+                print("Hash cache failed:", e)
+
+    def lookup(self, conn, paths):
+        paths = [path for path in dict.fromkeys(paths) if path not in self.seen]
+        self.seen.update(paths)
+        if not paths:
+            return
+        placeholders = ",".join("?" * len(paths))
+        known = {path: row for path, *row in conn.execute(
+            f"SELECT path, size, mtime_ns, digest FROM hashes WHERE path IN ({placeholders})", paths)}
+        cached, stale = {}, []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            row = known.get(path)
+            if row and (row[0], row[1]) == (stat.st_size, stat.st_mtime_ns):
+                if row[2]:
+                    cached[path] = row[2]
+            else:
+                stale.append(path)
+        for start in range(0, len(stale), HASH_BATCH):
+            future = self.executor.submit(hash_audio_files, stale[start:start + HASH_BATCH])
+            future.add_done_callback(self.pending.put)
+        if cached:
+            self.results.put(cached)
+
+    def store(self, conn, future):
+        if future.cancelled():
+            return
+        try:
+            hashes = future.result()
+        except Exception as e:
+            print("Could not hash files:", e)
+            return
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)", hashes)
+        self.results.put({path: digest for path, _, _, digest in hashes if digest})
+
+    def drain(self):
+        digests = {}
+        while True:
+            try:
+                digests.update(self.results.get_nowait())
+            except queue.Empty:
+                return digests
+# -----------------------------------------------------
+
+
+# -------------------- search index --------------------
+def search_text(path, info=None):
+    parts = [os.path.splitext(os.path.basename(path))[0]]
+    if info:
+        parts += [value for value in info[:3] if value]
+    return " ".join(parts).lower()
+
+
+class SearchIndex:
+    # Trigram index over the queue. Each distinct path gets an id and its
+    # trigrams get that id appended to a compact array('I') posting list.
+    # Removing a path only marks its id dead; postings are rebuilt once the
+    # dead ids outnumber the live ones. Queries made only of one- or
+    # two-letter words fall back to str.find() over the texts joined into
+    # one string per BLOCK_SIZE ids; a block is joined again only after one
+    # of its texts has changed or been added.
+    BLOCK_SIZE = 4096
+    RESULT_LIMIT = 500   # query() results, unless the caller asks for more
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.ids = {}
+        self.paths = []
+        self.texts = []
+        self.counts = []
+        self.postings = {}
+        self.dead = 0
+        self.blocks = []   # (joined texts, offsets), None once out of date
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def index_text(self, track_id, grams):
+        postings = self.postings
+        for gram in grams:
+            try:
+                postings[gram].append(track_id)
+            except KeyError:
+                postings[gram] = array('I', (track_id,))
+
+    def add(self, path, text=None):
+        track_id = self.ids.get(path)
+        if track_id is not None:
+            self.counts[track_id] += 1
+            return
+        text = search_text(path) if text is None else text
+        track_id = self.ids[path] = len(self.paths)
+        self.paths.append(path)
+        self.texts.append(text)
+        self.counts.append(1)
+        self.index_text(track_id, self.trigrams(text))
+
+    def count(self, path):
+        # how many queue entries hold path
+        track_id = self.ids.get(path)
+        return 0 if track_id is None else self.counts[track_id]
+
+    def discard(self, path):
+        track_id = self.ids.get(path)
+        if track_id is None:
+            return
+        self.counts[track_id] -= 1
+        if self.counts[track_id] == 0:
+            del self.ids[path]
+            self.texts[track_id] = None
+            self.dead += 1
+            if self.dead > max(50_000, len(self.ids)):
+                self.compact()
+
+    def update_text(self, path, text):
+        track_id = self.ids.get(path)
+        if track_id is None:
+            return
+        old = self.trigrams(self.texts[track_id])
+        self.texts[track_id] = text
+        self.index_text(track_id, self.trigrams(text) - old)
+        number = track_id // self.BLOCK_SIZE
+        if number < len(self.blocks):
+            self.blocks[number] = None
+
+    def compact(self):
+        live = [(path, self.texts[i], self.counts[i]) for path, i in self.ids.items()]
+        self.clear()
+        for path, text, count in live:
+            self.add(path, text)
+            self.counts[-1] = count
+
+    def query(self, text, limit=RESULT_LIMIT):
+        tokens = text.lower().split()
+        if not tokens:
+            return []
+        grams = set()
+        for token in tokens:
+            grams |= self.trigrams(token)
+        if not grams:
+            return self.scan(tokens, limit)
+        postings = [self.postings.get(gram) for gram in grams]
+        if any(posting is None for posting in postings):
+            return []
+        candidates = min(postings, key=len)
+        results = []
+        seen = set()
+        texts = self.texts
+        for track_id in candidates:
+            track_text = texts[track_id]
+            if track_text is not None and all(token in track_text for token in tokens) and track_id not in seen:
+                seen.add(track_id)
+                results.append(self.paths[track_id])
+                if len(results) >= limit:
+                    break
+        return results
+
+    def scan(self, tokens, limit):
+        first, rest = tokens[0], tokens[1:]
+        results = []
+        for number in range(-(-len(self.texts) // self.BLOCK_SIZE)):
+            blob, offsets = self.block(number)
+            base = number * self.BLOCK_SIZE
+            pos = blob.find(first)
+            while pos != -1:
+                index = bisect.bisect_right(offsets, pos) - 1
+                text = self.texts[base + index]
+                if text is not None and all(token in text for token in rest):
+                    results.append(self.paths[base + index])
+                    if len(results) >= limit:
+                        return results
+                pos = blob.find(first, offsets[index + 1])
+        return results
+
+    def block(self, number):
+        if number >= len(self.blocks):
+            self.blocks += [None] * (number + 1 - len(self.blocks))
+        start = number * self.BLOCK_SIZE
+        texts = self.texts[start:start + self.BLOCK_SIZE]
+        block = self.blocks[number]
+        if block is None or len(block[1]) - 1 != len(texts):
+            texts = [text or "" for text in texts]
+            block = self.blocks[number] = (
+                "\n".join(texts) + "\n",
+                array('Q', itertools.accumulate((len(text) + 1 for text in texts), initial=0)))
+        return block
+# -----------------------------------------------------
+
+
+# -------------------- animation scheduler --------------------
+class AnimationScheduler:
+    # Every animation shares one root.after() chain. Registering a name twice
+    # replaces the old entry instead of starting a second loop. An animation
+    # is skipped while its widget is unmapped or its active() check fails,
+    # and the chain stops when nothing is left to draw or the window is
+    # minimized; wake() restarts it.
+    def __init__(self, root):
+        self.root = root
+        self.animations = {}
+        self.job = None
+        root.bind("<Map>", lambda e: self.wake(), add="+")
+
+    def register(self, name, interval, callback, active=None, widget=None):
+        self.animations[name] = {"interval": interval, "callback": callback,
+                                 "active": active, "widget": widget, "due": 0}
+        self.wake()
+
+    def unregister(self, name):
+        self.animations.pop(name, None)
+
+    def is_running(self, animation):
+        if animation["widget"] is not None and not animation["widget"].winfo_ismapped():
+            return False
+        return animation["active"] is None or animation["active"]()
+
+    def wake(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+        self.job = self.root.after_idle(self.tick)
+
+    def tick(self):
+        self.job = None
+        if self.root.state() in ('iconic', 'withdrawn'):
+            return
+        now = time.monotonic() * 1000
+        next_due = None
+        for animation in list(self.animations.values()):
+            if not self.is_running(animation):
+                continue
+            if now >= animation["due"]:
+                # a callback may return its own delay for the next frame
+                delay = animation["callback"]()
+                animation["due"] = now + (delay or animation["interval"])
+            if next_due is None or animation["due"] < next_due:
+                next_due = animation["due"]
+        if next_due is not None:
+            self.job = self.root.after(max(1, int(next_due - now)), self.tick)
+# -----------------------------------------------------
+
+
+# -------------------- instrumentation --------------------
+class Histogram:
+    BOUNDS_MS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        # upper bound of the bucket holding that fraction of the samples
+        needed = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS_MS, self.buckets):
+            seen += count
+            if seen >= needed:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "mean_ms": self.total / self.count if self.count else 0.0,
+                "p50_ms": self.percentile(0.5), "p95_ms": self.percentile(0.95), "max_ms": self.max}
+
+
+class Metrics:
+    # Duration histograms for wrapped callbacks and commands, plus whatever
+    # else is record()ed: Tk event-loop lag and the gap between songs.
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+        self.track_ended_at = None
+
+    def record(self, name, ms):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(ms)
+
+    def wrap(self, name, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, (time.perf_counter() - start) * 1e3)
+        return timed
+
+    def instrument(self, obj, names, prefix=""):
+        for name in names:
+            setattr(obj, name, self.wrap(prefix + name, getattr(obj, name)))
+
+    def watch(self, prefix, fn):
+        # fn() returns {name: number}, read whenever metrics are shown or dumped
+        self.gauges[prefix] = fn
+
+    def gauge_values(self):
+        return {prefix + name: value for prefix, fn in self.gauges.items() for name, value in fn().items()}
+
+    def on_engine_event(self, event, data):
+        if event == "track_ended":
+            self.track_ended_at = time.perf_counter()
+        elif event == "track_changed" and data["path"] and self.track_ended_at is not None:
+            self.record("song_gap", (time.perf_counter() - self.track_ended_at) * 1e3)
+            self.track_ended_at = None
+
+    def summary(self):
+        return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def format(self):
+        lines = [f"{'name':<28}{'count':>7}{'mean':>9}{'p95':>9}{'max':>9}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<28}{stats['count']:>7}{stats['mean_ms']:>9.2f}"
+                         f"{stats['p95_ms']:>9.2f}{stats['max_ms']:>9.2f}")
+        for name, value in self.gauge_values().items():
+            lines.append(f"{name:<28}{value:>16.6g}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        summary = self.summary()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            if path.lower().endswith(".csv"):
+                writer = csv.writer(f)
+                writer.writerow(["name", "count", "mean_ms", "p50_ms", "p95_ms", "max_ms"])
+                for name, stats in summary.items():
+                    writer.writerow([name, stats["count"]] + [f"{stats[key]:.3f}" for key in
+                                                              ("mean_ms", "p50_ms", "p95_ms", "max_ms")])
+            else:
+                json.dump({"time": time.time(), "metrics": summary, "gauges": self.gauge_values()}, f, indent=2)
+        os.replace(tmp_path, path)
+# -----------------------------------------------------
+
+
+# -------------------- audio backends --------------------
+class DecodedAudioCache:
+    # Decoded tracks as pygame Sounds, so replaying or jumping back skips the
+    # disk (and the network, for mounted libraries) and the decoder. Least
+    # recently used tracks go once the PCM passes the byte budget. Decoding
+    # happens on one background thread; get() is a dict lookup.
+    def __init__(self, pygame, budget):
+        self.pygame = pygame
+        self.budget = budget
+        frequency, size, channels = pygame.mixer.get_init()
+        self.bytes_per_second = frequency * channels * abs(size) // 8
+        self.entries = OrderedDict()   # path -> (sound, bytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.wanted = set()
+        threading.Thread(target=self.decode_worker, daemon=True).start()
+
+    def get(self, path):
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(path)
+            self.hits += 1
+            return entry[0]
+
+    def prefetch(self, paths):
+        with self.lock:
+            paths = [path for path in paths if path not in self.entries and path not in self.wanted]
+            self.wanted.update(paths)
+        for path in paths:
+            self.pending.put(path)
+
+    def decode_worker(self):
+        while True:
+            path = self.pending.get()
+            try:
+                sound = self.pygame.mixer.Sound(path)
+            except (self.pygame.error, OSError):
+                sound = None   # a format only the streaming player can read
+            with self.lock:
+                self.wanted.discard(path)
+                if sound is None:
+                    continue
+                size = int(sound.get_length() * self.bytes_per_second)
+                if size > self.budget:
+                    continue
+                self.entries[path] = (sound, size)
+                self.bytes += size
+                while self.bytes > self.budget:
+                    _, (_, old_size) = self.entries.popitem(last=False)
+                    self.bytes -= old_size
+                    self.evicted += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "tracks": len(self.entries), "mb": self.bytes / 1e6, "budget_mb": self.budget / 1e6,
+                    "evicted": self.evicted}
+
+
+class PygameBackend:
+    # pygame.mixer.music behind the few calls PlayerEngine needs. Run with
+    # SDL_AUDIODRIVER=dummy to exercise it without a sound card. The
+    # constructor may run on a background thread; attach() runs on the
+    # engine's thread. With a cache budget, tracks already decoded play as a
+    # Sound on a reserved channel instead, which starts without touching disk.
+    def __init__(self, cache_bytes=0):
+        start = time.perf_counter()
+        import pygame
+        startup_mark("import pygame", start)
+        start = time.perf_counter()
+        pygame.mixer.init()
+        startup_mark("mixer init", start)
+        self.pygame = pygame
+        self.music = pygame.mixer.music
+        self.end_event = pygame.USEREVENT + 1
+        self.end_events = False
+        self.cache = DecodedAudioCache(pygame, cache_bytes) if cache_bytes else None
+        self.channel = None
+        self.path = None
+        self.sound = None   # set while playing from the cache
+        self.queued_sound = None
+        self.sound_started = 0.0
+        self.sound_paused = None
+        self.volume = 1.0
+
+    def attach(self):
+        if self.cache:
+            self.pygame.mixer.set_reserved(1)
+            self.channel = self.pygame.mixer.Channel(0)
+        # End-of-track events need SDL's video subsystem (no window is opened).
+        # Without them the engine polls get_busy() instead, as it does on
+        # macOS, where SDL video and Tk would both claim the application.
+        if sys.platform == "darwin":
+            return
+        try:
+            self.pygame.display.init()
+            self.music.set_endevent(self.end_event)
+            if self.channel:
+                self.channel.set_endevent(self.end_event)
+            self.end_events = True
+        except Exception as e:
+            print("Warning: end-of-track events unavailable, polling instead:", e)
+
+    def load(self, path):
+        sound = self.cache.get(path) if self.cache else None
+        if self.busy():
+            self.stop()
+        if sound is None:
+            self.music.load(path)
+            if self.cache:
+                self.cache.prefetch([path])   # decoded while it plays, for next time
+        self.path = path
+        self.sound = sound
+
+    def play(self, start=0.0):
+        if self.sound is not None and start:
+            self.sound = None   # Sounds can't seek; stream this one
+            self.music.load(self.path)
+        if self.sound is not None:
+            self.channel.play(self.sound)
+            self.channel.set_volume(self.volume)
+            self.sound_started = time.perf_counter()
+            self.sound_paused = None
+            return
+        try:
+            self.music.play(start=start)
+        except self.pygame.error:
+            self.music.play()   # not every format can seek
+
+    def queue(self, path):
+        # gapless only within one mode: streamed after streamed, cached after cached
+        if self.sound is None:
+            self.music.queue(path)
+            return True
+        sound = self.cache.get(path) if path in self.cache.entries else None
+        if sound is None:
+            return False
+        self.queued_sound = sound
+        self.channel.queue(sound)
+        return True
+
+    def prefetch(self, paths):
+        if self.cache:
+            self.cache.prefetch(paths)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else {}
+
+    def pause(self):
+        if self.sound is not None:
+            self.channel.pause()
+            self.sound_paused = time.perf_counter()
+        else:
+            self.music.pause()
+
+    def unpause(self):
+        if self.sound is not None:
+            self.channel.unpause()
+            self.sound_started += time.perf_counter() - self.sound_paused
+            self.sound_paused = None
+        else:
+            self.music.unpause()
+
+    def stop(self):
+        self.music.stop()
+        if self.channel:
+            self.channel.stop()
+        self.sound = None
+        self.queued_sound = None
+        if self.end_events:
+            self.pygame.event.clear(self.end_event)   # stop() posts one too
+
+    def set_volume(self, volume):
+        self.volume = volume
+        self.music.set_volume(volume)
+        if self.channel:
+            self.channel.set_volume(volume)
+
+    def busy(self):
+        if self.sound is not None:
+            return self.channel.get_busy()
+        return self.music.get_busy()
+
+    def position(self):
+        # seconds since play() or since a queued track took over
+        if self.sound is not None:
+            return (self.sound_paused or time.perf_counter()) - self.sound_started
+        return max(0, self.music.get_pos()) / 1000
+
+    def ended(self):
+        count = len(self.pygame.event.get(self.end_event))
+        if count and self.queued_sound is not None:
+            self.sound, self.queued_sound = self.queued_sound, None
+            self.sound_started = time.perf_counter()
+        return count
+
+    def quit(self):
+        self.pygame.mixer.quit()
+
+
+class FakeBackend:
+    # Pretends every track lasts track_length seconds (forever if None), so
+    # the engine can be driven and timed without any audio device.
+    end_events = True
+
+    def __init__(self, track_length=None):
+        self.track_length = track_length
+        self.loaded = None
+        self.queued = None
+        self.started = None
+        self.paused = False
+        self.volume = 1.0
+        self.history = []
+
+    def attach(self):
+        pass
+
+    def load(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.loaded = path
+        self.queued = None
+        self.started = None
+
+    def play(self, start=0.0):
+        self.started = time.perf_counter()
+        self.paused = False
+        self.history.append(self.loaded)
+
+    def queue(self, path):
+        self.queued = path
+        return True
+
+    def prefetch(self, paths):
+        pass
+
+    def cache_stats(self):
+        return {}
+
+    def pause(self):
+        self.paused = True
+
+    def unpause(self):
+        self.paused = False
+
+    def stop(self):
+        self.started = None
+        self.queued = None
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def busy(self):
+        return self.started is not None
+
+    def position(self):
+        return time.perf_counter() - self.started if self.started is not None else 0.0
+
+    def ended(self):
+        if self.started is None or self.paused or self.track_length is None:
+            return 0
+        if time.perf_counter() - self.started < self.track_length:
+            return 0
+        if self.queued:
+            self.loaded, self.queued = self.queued, None
+            self.play()
+        else:
+            self.started = None
+        return 1
+
+    def quit(self):
+        pass
+# -----------------------------------------------------
+
+
+# -------------------- player engine --------------------
+class PlayerEngine:
+    # Owns the queue, the playback state and the audio backend, with no Tk
+    # dependency. Views and scripts call the command methods and subscribe()
+    # to events; poll() has to be called regularly (every ~10 ms) from the
+    # thread that owns the engine to pick up track ends and background work.
+    #
+    # Events: queue_changed(change, args), track_ended(), track_changed(path),
+    # state_changed(), metadata_changed(paths), error(path, message),
+    # audio_changed(available)
+    HISTORY_SIZE = 100
+    PREFETCH_AHEAD = 2
+    SHUFFLE_MODES = ("off", "random", "artist")
+    REPEAT_MODES = ("off", "all", "one")
+    SPREAD_ARTISTS = 3   # artist shuffle avoids the last few artists played...
+    SPREAD_TRIES = 8     # ...for up to this many random draws
+    SKIP_TRIES = 32      # random draws before a skipping shuffle scans instead
+
+    def __init__(self, backend=None, library=None, analyzer=None, hasher=None):
+        self.backend = None
+        self.audio_available = False
+        self.backend_results = None
+        self.library = library
+        self.analyzer = analyzer
+        self.hasher = hasher
+        self.gains = {}
+        self.volume = 1.0
+        self.normalize = analyzer is not None
+        self.music_queue = TrackQueue()
+        self.search_index = SearchIndex()
+        self.unreachable = set()
+        self.digests = {}      # path -> content digest, once hashed
+        self.members = {}      # digest -> hashed paths in the queue
+        self.played = {}       # digest (or path, if not hashed) -> path played since the queue was last empty
+        self.duplicates = {}   # path -> the original it duplicates, itself if queued twice
+        self.skip_duplicates = False
+        self.current_song = None
+        self.history = deque(maxlen=self.HISTORY_SIZE)
+        self.shuffle = "off"
+        self.shuffle_pick = None
+        self.recent_artists = deque(maxlen=self.SPREAD_ARTISTS)
+        self.repeat = "off"
+        self.repeat_pool = []
+        self.cued = None
+        self.position_offset = 0.0
+        self.is_playing = False
+        self.is_paused = False
+        self.listeners = []
+
+        self.queued_song = None
+        self.preloading = None
+        self.preload_results = queue.Queue()
+        if backend is not None:
+            self.set_backend(backend)
+
+    def init_backend_async(self, factory):
+        # Opening the audio device can take a while; poll() attaches the
+        # backend once it's ready and emits audio_changed.
+        self.backend_results = queue.Queue(maxsize=1)
+
+        def init():
+            try:
+                self.backend_results.put(factory())
+            except Exception as e:
+                self.backend_results.put(e)
+        threading.Thread(target=init, daemon=True).start()
+
+    def set_backend(self, backend):
+        backend.attach()
+        self.backend = backend
+        self.audio_available = True
+        self.apply_volume()
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def emit(self, event, **data):
+        for callback in self.listeners:
+            callback(event, data)
+
+    # -------------------- queue --------------------
+    def enqueue(self, paths):
+        paths = list(paths)
+        info = self.library.lookup_many(paths) if self.library else {}
+        for path in paths:
+            self.search_index.add(path, search_text(path, info.get(path)))
+        self.music_queue.extend(paths)
+        self.queue_changed("append_batch", len(paths))
+        self.flags_changed(self.join_groups(paths))
+        if self.library:
+            self.library.scan_async(paths)
+        if self.analyzer:
+            self.analyzer.submit(paths)
+        if self.hasher:
+            self.hasher.submit(paths)
+
+    def dequeue(self, index=0):
+        # views, move_pick() and the session journal all take index as a
+        # position from the front
+        if not 0 <= index < len(self.music_queue):
+            raise IndexError(f"no queue entry {index}")
+        path = self.music_queue.pop(index)
+        self.search_index.discard(path)
+        changed = self.join_groups([path]) if path in self.search_index.ids else self.leave_group(path)
+        if not self.music_queue:
+            self.played = {}
+        if index == 0:
+            self.queue_changed("pop_front")
+        else:
+            self.queue_changed("remove_at", index)
+        self.flags_changed(changed)
+        return path
+
+    def insert(self, index, path):
+        info = self.library.lookup_many([path]) if self.library else {}
+        self.search_index.add(path, search_text(path, info.get(path)))
+        self.music_queue.insert(index, path)
+        self.queue_changed("insert_at", index)
+        self.flags_changed(self.join_groups([path]))
+
+    def clear_queue(self):
+        self.music_queue.clear()
+        self.search_index.clear()
+        self.members = {}
+        self.played = {}
+        self.repeat_pool = []
+        self.shuffle_pick = None
+        flagged = list(self.duplicates)
+        self.duplicates.clear()
+        self.queue_changed("clear")
+        self.flags_changed(flagged)
+
+    def queue_changed(self, change, *args):
+        if self.shuffle_pick is not None:
+            self.move_pick(change, args)
+        self.emit("queue_changed", change=change, args=args)
+        self.preload_next()
+        self.prefetch_audio()
+
+    # -------------------- shuffle and repeat --------------------
+    # Shuffle never reorders the queue. The next track is a random index
+    # into it (lazy Fisher-Yates: each step draws uniformly from what's
+    # left), so a step costs one O(log n) TrackQueue.pop() however big the
+    # queue is. The drawn index is kept in shuffle_pick, so gapless preload
+    # knows what's next, and is moved along as the queue changes.
+    def set_shuffle(self, mode):
+        if mode not in self.SHUFFLE_MODES:
+            raise ValueError(f"shuffle must be one of {', '.join(self.SHUFFLE_MODES)}")
+        self.shuffle = mode
+        self.shuffle_pick = None
+        self.emit("state_changed")
+        self.preload_next()
+
+    def set_repeat(self, mode):
+        if mode not in self.REPEAT_MODES:
+            raise ValueError(f"repeat must be one of {', '.join(self.REPEAT_MODES)}")
+        self.repeat = mode
+        if mode != "all":
+            self.repeat_pool = []
+        self.emit("state_changed")
+        self.preload_next()
+
+    def next_index(self):
+        # None when everything left in the queue is a skipped duplicate
+        if self.shuffle == "off":
+            return self.first_playable()
+        pick = self.shuffle_pick
+        if pick is None or self.skipped(self.music_queue[pick]):
+            pick = self.shuffle_pick = self.draw_index()
+        return pick
+
+    def draw_index(self):
+        index = self.random_index()
+        if index is not None and self.shuffle == "artist" and self.library and self.recent_artists:
+            # rejection sampling: O(1) expected, and a lone artist can't stall it
+            for _ in range(self.SPREAD_TRIES - 1):
+                artist = self.artist_of(self.music_queue[index])
+                if artist is None or artist not in self.recent_artists:
+                    break
+                index = self.random_index()
+        return index
+
+    def random_index(self):
+        # uniform over the tracks that aren't skipped
+        count = len(self.music_queue)
+        for _ in range(self.SKIP_TRIES):
+            index = random.randrange(count)
+            if not self.skipped(self.music_queue[index]):
+                return index
+        return self.first_playable()
+
+    def artist_of(self, path):
+        info = self.library.lookup_many([path]).get(path) if self.library else None
+        return info[1] if info else None
+
+    def move_pick(self, change, args):
+        pick = self.shuffle_pick
+        total = len(self.music_queue)
+        if change == "append_batch":
+            # keeps the pick uniform: the new tracks win with probability count/total
+            count = args[0]
+            if count and random.randrange(total) < count:
+                pick = total - count + random.randrange(count)
+        elif change in ("pop_front", "remove_at"):
+            index = args[0] if args else 0
+            pick = None if index == pick else pick - (index < pick)
+        elif change == "insert_at":
+            pick += args[0] <= pick
+            if random.randrange(total) == 0:
+                pick = args[0]
+        elif change == "clear":
+            pick = None
+        self.shuffle_pick = pick
+
+    def upcoming(self):
+        # (path, queue index) of what plays when the current track ends; the
+        # index is None when it doesn't come from the queue (repeat one).
+        # Only looks: the repeat pool is refilled by play_next().
+        if self.repeat == "one" and self.current_song:
+            return self.current_song, None
+        if not self.music_queue:
+            return None, None
+        index = self.next_index()
+        if index is None:
+            return None, None
+        return self.music_queue[index], index
+
+    def refill(self, force=False):
+        # repeat all: played tracks wait in repeat_pool until the queue runs
+        # out, so each one plays once per round, shuffled or not. force
+        # starts the next round early, when only skipped duplicates are left.
+        if self.repeat == "all" and self.repeat_pool and (force or not self.music_queue):
+            pool, self.repeat_pool = self.repeat_pool, []
+            played, self.played = self.played, {}
+            self.flags_changed(self.regroup(played) + self.join_groups(played.values()))
+            self.enqueue(pool)
+            return True
+        return False
+
+    def took(self, path):
+        if self.repeat == "all":
+            self.repeat_pool.append(path)
+        if self.shuffle == "artist":
+            self.recent_artists.append(self.artist_of(path))
+        self.played[self.digests.get(path, path)] = path
+    # -----------------------------------------------------
+
+    # -------------------- duplicates --------------------
+    # Hashed paths with the same audio form a group. Its original is the
+    # track already played from the queue since it was last empty, or else
+    # the one added first; the others in the queue are flagged in
+    # duplicates. A path queued more than once, or queued again after it
+    # played, is flagged as a duplicate of itself, hashed or not; until
+    # one copy has played the others aren't skipped. Flags go once only
+    # one unplayed entry is left, and all of them when the queue is
+    # cleared. With skip_duplicates, next_index() passes over flagged
+    # tracks but leaves them queued.
+    def skipped(self, path):
+        original = self.duplicates.get(path) if self.skip_duplicates else None
+        return original is not None and (original != path or self.has_played(path))
+
+    def has_played(self, path):
+        return self.played.get(self.digests.get(path, path)) == path
+
+    def repeated(self, path):
+        return self.search_index.count(path) > 1 or self.has_played(path)
+
+    def first_playable(self):
+        if not (self.skip_duplicates and self.duplicates):
+            return 0 if self.music_queue else None
+        for index, path in enumerate(self.music_queue.islice()):
+            if not self.skipped(path):
+                return index
+        return None
+
+    def join_groups(self, paths):
+        # also called when a path's number of queue entries changes
+        digests = set()
+        changed = []
+        for path in paths:
+            digest = self.digests.get(path)
+            if path not in self.search_index.ids:
+                continue
+            if digest is not None:
+                self.members.setdefault(digest, set()).add(path)
+                digests.add(digest)
+            elif self.flag(path, path if self.repeated(path) else None):
+                changed.append(path)
+        return changed + self.regroup(digests)
+
+    def leave_group(self, path):
+        # the last copy of path has left the queue
+        changed = [path] if self.duplicates.pop(path, None) else []
+        digest = self.digests.get(path)
+        members = self.members.get(digest)
+        if members and path in members:
+            members.discard(path)
+            if not members:
+                del self.members[digest]
+            changed += self.regroup([digest])
+        return changed
+
+    def regroup(self, digests):
+        changed = []
+        ids = self.search_index.ids
+        for digest in digests:
+            members = self.members.get(digest, ())
+            original = self.played.get(digest) or min(members, key=ids.__getitem__, default=None)
+            for path in members:
+                if path != original:
+                    target = original
+                else:
+                    target = path if self.repeated(path) else None
+                if self.flag(path, target):
+                    changed.append(path)
+        return changed
+
+    def flag(self, path, original):
+        # True if the flag changed; None clears it
+        if original is None:
+            return self.duplicates.pop(path, None) is not None
+        if self.duplicates.get(path) == original:
+            return False
+        self.duplicates[path] = original
+        return True
+
+    def flags_changed(self, paths):
+        if paths:
+            self.emit("metadata_changed", paths=paths)
+    # -----------------------------------------------------
+
+    def prefetch_audio(self):
+        # let the backend decode what's coming up before it's needed
+        if self.audio_available and self.music_queue:
+            upcoming = self.upcoming()[0]
+            self.backend.prefetch([path for path in [upcoming] + self.music_queue[:self.PREFETCH_AHEAD - 1] if path])
+
+    def cache_stats(self):
+        return self.backend.cache_stats() if self.audio_available else {}
+
+    # -------------------- transport --------------------
+    def start(self, path, position=0.0):
+        self.cued = None
+        self.leave_current()
+        try:
+            self.backend.load(path)
+            self.backend.play(position)
+        except Exception as e:
+            self.current_song = None
+            self.is_playing = False
+            self.emit("state_changed")
+            self.emit("error", path=path, message=str(e))
+            return False
+        self.current_song = path
+        self.position_offset = position
+        self.unreachable.discard(path)
+        self.is_playing = True
+        self.is_paused = False
+        self.apply_volume()
+        self.emit("track_changed", path=path)
+        self.emit("state_changed")
+        self.preload_next()
+        self.prefetch_audio()
+        return True
+
+    def leave_current(self):
+        # remember what was playing, for previous()
+        if self.current_song and (self.is_playing or self.is_paused):
+            self.history.append(self.current_song)
+
+    def cue(self, path, position=0.0):
+        # show a track without playing it; play_pause() starts it at position
+        self.cued = (path, position)
+        self.current_song = path
+        self.emit("track_changed", path=path)
+
+    def position(self):
+        if self.is_playing or self.is_paused:
+            return self.position_offset + self.backend.position()
+        return self.cued[1] if self.cued else 0.0
+
+    def play_next(self):
+        self.refill()
+        while self.music_queue:
+            index = self.next_index()
+            if index is None:
+                if self.refill(force=True):
+                    continue
+                return False
+            if self.start_from_queue(index):
+                return True
+            self.refill()
+        return False
+
+    def play_index(self, index):
+        if index < 0 or index >= len(self.music_queue):
+            return False
+        self.stop()
+        return self.start_from_queue(index)
+
+    def start_from_queue(self, index):
+        path = self.music_queue[index]
+        if path in self.unreachable:
+            self.dequeue(index)
+            return False
+        self.took(path)
+        self.dequeue(index)
+        if self.start(path):
+            return True
+        if self.repeat_pool and self.repeat_pool[-1] == path:
+            self.repeat_pool.pop()
+        return False
+
+    def play_pause(self):
+        if self.is_paused:
+            self.backend.unpause()
+            self.is_paused = False
+            self.is_playing = True
+            self.emit("state_changed")
+            self.preload_next()
+        elif self.is_playing:
+            self.backend.pause()
+            self.is_paused = True
+            self.is_playing = False
+            self.emit("state_changed")
+        elif self.cued:
+            self.start(*self.cued)
+        else:
+            self.play_next()
+
+    def stop(self):
+        self.leave_current()
+        if self.audio_available:
+            self.backend.stop()
+        self.queued_song = None
+        self.is_playing = False
+        self.is_paused = False
+        self.current_song = None
+        self.cued = None
+        self.emit("track_changed", path=None)
+        self.emit("state_changed")
+
+    def next(self):
+        if not self.music_queue:
+            return False
+        self.stop()
+        return self.play_next()
+
+    def previous(self):
+        # back to the last track played; the current one goes back to the
+        # front of the queue
+        if not self.history:
+            return False
+        path = self.history.pop()
+        current, self.current_song = self.current_song, None
+        self.stop()
+        if current:
+            # it plays again from the queue, and took() will pool it then
+            if self.repeat_pool and self.repeat_pool[-1] == current:
+                self.repeat_pool.pop()
+            self.insert(0, current)
+        return self.start(path)
+
+    def set_volume(self, volume):
+        self.volume = volume
+        self.apply_volume()
+
+    def set_normalize(self, enabled):
+        self.normalize = enabled
+        self.apply_volume()
+
+    def set_skip_duplicates(self, enabled):
+        self.skip_duplicates = enabled
+        self.preload_next()
+        self.prefetch_audio()
+
+    def track_volume(self, path):
+        # the slider value scaled by the track's gain, never past its peak
+        gain = self.gains.get(path)
+        if not (self.normalize and gain):
+            return self.volume
+        gain_db, peak = gain
+        factor = 10 ** (gain_db / 20)
+        if peak > 0:
+            factor = min(factor, 1.0 / peak)
+        return min(1.0, self.volume * factor)
+
+    def apply_volume(self):
+        if self.audio_available:
+            self.backend.set_volume(self.track_volume(self.current_song))
+
+    def shutdown(self):
+        if self.analyzer:
+            self.analyzer.shutdown()
+        if self.hasher:
+            self.hasher.shutdown()
+        if self.audio_available:
+            self.backend.quit()
+
+    # -------------------- track transitions --------------------
+    # The head of the queue is read through once in the background (which
+    # also warms the OS cache) and then handed to the backend's queue(), so
+    # SDL starts it the moment the current track ends. The end event only
+    # tells us to catch the state up.
+    def preload_next(self):
+        if not (self.audio_available and self.backend.end_events and self.is_playing):
+            return
+        next_song = self.upcoming()[0]
+        if next_song is None or next_song in (self.queued_song, self.preloading):
+            return
+        self.preloading = next_song
+        threading.Thread(target=self.validate_track, args=(next_song,), daemon=True).start()
+
+    def validate_track(self, path):
+        try:
+            with open(path, 'rb') as f:
+                while f.read(1 << 20):
+                    pass
+            ok = True
+        except OSError:
+            ok = False
+        self.preload_results.put((path, ok))
+
+    def handle_preload_results(self):
+        while True:
+            try:
+                path, ok = self.preload_results.get_nowait()
+            except queue.Empty:
+                return
+            if path == self.preloading:
+                self.preloading = None
+            if not (ok and self.is_playing and self.upcoming()[0] == path):
+                continue
+            try:
+                if self.backend.queue(path):
+                    self.queued_song = path
+            except Exception as e:
+                print("Could not preload", path, e)
+
+    def on_track_end(self):
+        if not self.is_playing:
+            return
+        self.emit("track_ended")
+        started, self.queued_song = self.queued_song, None
+        path, index = self.upcoming()
+        if started and self.backend.busy() and path == started:
+            # the backend is already playing the preloaded track
+            self.leave_current()
+            if index is not None:
+                self.took(started)
+                self.dequeue(index)
+            self.current_song = started
+            self.position_offset = 0.0
+            self.apply_volume()
+            self.emit("track_changed", path=started)
+            self.prefetch_audio()
+        elif self.repeat == "one" and self.current_song and self.start(self.current_song):
+            pass
+        elif not self.play_next():
+            self.stop()
+
+    def poll(self):
+        if self.backend_results is not None and not self.backend_results.empty():
+            result = self.backend_results.get()
+            self.backend_results = None
+            if isinstance(result, Exception):
+                print("Warning: pygame.mixer.init() failed:", result)
+            else:
+                self.set_backend(result)
+            self.emit("audio_changed", available=self.audio_available)
+        if self.audio_available:
+            if self.backend.end_events:
+                self.handle_preload_results()
+                for _ in range(self.backend.ended()):
+                    self.on_track_end()
+            elif self.is_playing and not self.backend.busy():
+                self.on_track_end()
+        if self.library:
+            updated = self.library.drain_updates()
+            if updated:
+                info = self.library.lookup_many(updated)
+                for path in updated:
+                    self.search_index.update_text(path, search_text(path, info.get(path)))
+                self.emit("metadata_changed", paths=updated)
+            missing = self.library.drain_missing()
+            if missing:
+                self.unreachable.update(missing)
+                self.emit("metadata_changed", paths=missing)
+        if self.analyzer:
+            gains = self.analyzer.drain()
+            if gains:
+                self.gains.update(gains)
+                if self.current_song in gains:
+                    self.apply_volume()
+        if self.hasher:
+            digests = self.hasher.drain()
+            if digests:
+                self.digests.update(digests)
+                for path in digests:
+                    if path in self.played:   # played before its hash came in
+                        self.played.setdefault(digests[path], self.played.pop(path))
+                self.flags_changed(self.join_groups(digests))
+# -----------------------------------------------------
+
+
+class MusicPlayerGUI:
+    POLL_BUSY_MS = 10
+    POLL_IDLE_MS = 250
+
+    def __init__(self, root, engine=None, metrics=None, metrics_dump=None):
+        self.root = root
+        self.root.title("My Music Playlist")
+        self.root.geometry("800x600")
+        self.root.configure(bg='#0a0a0a')
+        
+        self.animation_speed = 50
+        self.hover_animations = {}
+        self.animations = AnimationScheduler(root)
+        self.pulse_phase = 0
+        self.loading_angle = 0
+
+        self.engine = engine or create_engine()
+        self.engine.subscribe(self.on_engine_event)
+        self.metrics = metrics
+        self.metrics_dump = metrics_dump
+        self.metrics_overlay = None
+        if metrics:
+            self.instrument(metrics)
+        self.music_queue = self.engine.music_queue
+        self.display_names = DisplayNameCache(self.engine.library, self.engine.unreachable, self.engine.duplicates)
+        self.queue_views = []
+
+        self.importer = None
+        self.import_added = 0
+        self.import_done = None
+        self.session = None
+        self.session_then = []
+        self.control = None
+
+        # for GIF
+        self.spinner_frames = []
+        self.spinner_index = 0
+
+        self.setup_ui()
+        # after first paint: the spinner only shows once something plays
+        self.root.after(20, lambda: self.load_spinner_gif("nailong.gif"))  # load your gif
+        self.start_animations()
+        self.poll_engine()
+        if metrics:
+            self.heartbeat()
+            self.root.bind("<F12>", lambda e: self.toggle_metrics_overlay())
+            if metrics_dump:
+                self.root.after(5000, self.dump_metrics)
+        
+    def setup_ui(self):
+        main_frame = tk.Frame(self.root, bg='#1a1a2e', relief=tk.FLAT, bd=0)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+
+        title_frame = tk.Frame(main_frame, bg='#1a1a2e')
+        title_frame.pack(fill=tk.X, pady=(0, 20))
+
+        self.title_label = tk.Label(title_frame, text="🎵 MY MUSIC PLAYER", 
+                                   font=('Arial', 20, 'bold'), fg='#00ff88', bg='#1a1a2e')
+        self.title_label.pack()
+
+        add_frame = tk.Frame(main_frame, bg='#1a1a2e')
+        add_frame.pack(pady=10)
+
+        self.add_music_btn = self.create_animated_button(add_frame, "ADD SONGS", 
+                                                        self.add_music_files, '#ff6b6b', '#ff5252')
+        self.add_music_btn.pack(side=tk.LEFT, padx=5)
+
+        self.add_folder_btn = self.create_animated_button(add_frame, "ADD FOLDER", 
+                                                         self.add_music_folder, '#ff6b6b', '#ff5252')
+        self.add_folder_btn.pack(side=tk.LEFT, padx=5)
+
+        self.open_playlist_btn = self.create_animated_button(add_frame, "OPEN PLAYLIST", 
+                                                            self.open_playlist, '#ff6b6b', '#ff5252')
+        self.open_playlist_btn.pack(side=tk.LEFT, padx=5)
+
+        current_frame = tk.Frame(main_frame, bg='#16213e', relief=tk.RAISED, bd=2)
+        current_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        tk.Label(current_frame, text="♪ NOW PLAYING ♪", 
+                font=('Arial', 12, 'bold'), fg='#00ff88', bg='#16213e').pack(pady=(10, 5))
+
+        # Big GIF in the middle like Spotify
+        self.spinner_label = tk.Label(current_frame, bg='#16213e')
+        self.spinner_label.pack(pady=20)
+
+        self.current_song_label = tk.Label(current_frame, text="No song selected", 
+                                          font=('Arial', 11), fg='#ffffff', bg='#16213e',
+                                          wraplength=400)
+        self.current_song_label.pack(pady=(0, 10))
+
+        control_frame = tk.Frame(main_frame, bg='#1a1a2e')
+        control_frame.pack(pady=20)
+        
+        self.prev_btn = self.create_animated_button(control_frame, "⏮️ PREV", 
+                                                   self.previous_song, '#FF9800', '#F57C00')
+        self.prev_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.play_btn = self.create_animated_button(control_frame, "▶️ PLAY", 
+                                                   self.play_pause_music, '#4CAF50', '#45a049')
+        self.play_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.stop_btn = self.create_animated_button(control_frame, "⏹️ STOP", 
+                                                   self.stop_music, '#f44336', '#da190b')
+        self.stop_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.next_btn = self.create_animated_button(control_frame, "⏭️ NEXT", 
+                                                   self.next_song, '#FF9800', '#F57C00')
+        self.next_btn.pack(side=tk.LEFT, padx=5)
+
+        mode_frame = tk.Frame(main_frame, bg='#1a1a2e')
+        mode_frame.pack()
+
+        self.shuffle_btn = self.create_animated_button(mode_frame, "", 
+                                                      self.cycle_shuffle, '#9b59b6', '#8e44ad')
+        self.shuffle_btn.pack(side=tk.LEFT, padx=5)
+
+        self.repeat_btn = self.create_animated_button(mode_frame, "", 
+                                                     self.cycle_repeat, '#9b59b6', '#8e44ad')
+        self.repeat_btn.pack(side=tk.LEFT, padx=5)
+        self.update_mode_buttons()
+
+        self.skip_duplicates_var = tk.BooleanVar(value=self.engine.skip_duplicates)
+        self.skip_duplicates_check = tk.Checkbutton(
+            mode_frame, text="SKIP DUPLICATES", variable=self.skip_duplicates_var,
+            command=lambda: self.engine.set_skip_duplicates(self.skip_duplicates_var.get()),
+            font=('Arial', 9, 'bold'), fg='#ffffff', bg='#1a1a2e', selectcolor='#2d2d2d',
+            activebackground='#1a1a2e', activeforeground='#00ff88', highlightthickness=0)
+        self.skip_duplicates_check.pack(side=tk.LEFT, padx=(10, 0))
+        if self.engine.hasher is None:
+            self.skip_duplicates_check.config(state=tk.DISABLED)
+
+        volume_frame = tk.Frame(main_frame, bg='#1a1a2e')
+        volume_frame.pack(pady=10)
+        
+        tk.Label(volume_frame, text="🔊 VOLUME", font=('Arial', 10, 'bold'), 
+                fg='#ffffff', bg='#1a1a2e').pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.volume_var = tk.DoubleVar(value=70)
+        self.volume_scale = tk.Scale(volume_frame, from_=0, to=100, orient=tk.HORIZONTAL,
+                                    variable=self.volume_var, command=self.change_volume,
+                                    bg='#2d2d2d', fg='#ffffff', highlightthickness=0,
+                                    troughcolor='#404040', activebackground='#00ff88')
+        self.volume_scale.pack(side=tk.LEFT)
+
+        self.normalize_var = tk.BooleanVar(value=self.engine.normalize)
+        self.normalize_check = tk.Checkbutton(volume_frame, text="NORMALIZE", variable=self.normalize_var,
+                                              command=lambda: self.engine.set_normalize(self.normalize_var.get()),
+                                              font=('Arial', 9, 'bold'), fg='#ffffff', bg='#1a1a2e',
+                                              selectcolor='#2d2d2d', activebackground='#1a1a2e',
+                                              activeforeground='#00ff88', highlightthickness=0)
+        self.normalize_check.pack(side=tk.LEFT, padx=(10, 0))
+        if self.engine.analyzer is None:
+            self.normalize_check.config(state=tk.DISABLED)
+
+        queue_frame = tk.Frame(main_frame, bg='#16213e', relief=tk.RAISED, bd=2)
+        queue_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        queue_header = tk.Frame(queue_frame, bg='#16213e')
+        queue_header.pack(fill=tk.X, pady=10)
+        
+        tk.Label(queue_header, text="🎼 QUEUE", font=('Arial', 12, 'bold'), 
+                fg='#00ff88', bg='#16213e').pack(side=tk.LEFT, padx=20)
+        
+        self.queue_count_label = tk.Label(queue_header, text="(0 songs)", 
+                                         font=('Arial', 10), fg='#cccccc', bg='#16213e')
+        self.queue_count_label.pack(side=tk.LEFT, padx=10)
+
+        self.search_var = tk.StringVar()
+        self.search_more = False   # the filtered view stopped at SearchIndex.RESULT_LIMIT
+        self.search_entry = tk.Entry(queue_header, textvariable=self.search_var, width=24,
+                                     bg='#2d2d2d', fg='#ffffff', insertbackground='#ffffff',
+                                     font=('Arial', 10), relief=tk.FLAT, bd=0, highlightthickness=0)
+        self.search_entry.pack(side=tk.RIGHT, padx=(0, 20))
+        tk.Label(queue_header, text="🔍", font=('Arial', 10), 
+                fg='#cccccc', bg='#16213e').pack(side=tk.RIGHT, padx=5)
+        self.search_var.trace_add("write", lambda *args: self.run_search())
+
+        queue_list_frame = tk.Frame(queue_frame, bg='#16213e')
+        queue_list_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
+        
+        self.queue_view = VirtualQueueView(queue_list_frame, self.music_queue, self.display_names,
+                                           "{index:02d}. {name}",
+                                           bg='#2d2d2d', fg='#ffffff',
+                                           selectbackground='#00ff88', selectforeground='#000000',
+                                           font=('Arial', 10), relief=tk.FLAT, bd=0,
+                                           highlightthickness=0, activestyle='none')
+        self.queue_view.pack()
+        self.queue_views.append(self.queue_view)
+        self.queue_view.bind("<Double-Button-1>", self.on_queue_double_click)
+
+        queue_btn_frame = tk.Frame(queue_frame, bg='#16213e')
+        queue_btn_frame.pack(pady=(0, 15))
+        
+        self.remove_btn = self.create_animated_button(queue_btn_frame, "REMOVE", 
+                                                     self.remove_selected, '#e74c3c', '#c0392b')
+        self.remove_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.clear_btn = self.create_animated_button(queue_btn_frame, "CLEAR ALL", 
+                                                    self.clear_queue, '#95a5a6', '#7f8c8d')
+        self.clear_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.peek_btn = self.create_animated_button(queue_btn_frame, "PEEK QUEUE", 
+                                                   self.peek_queue, '#3498db', '#2980b9')
+        self.peek_btn.pack(side=tk.LEFT, padx=5)
+
+        self.save_playlist_btn = self.create_animated_button(queue_btn_frame, "SAVE PLAYLIST", 
+                                                            self.save_playlist, '#3498db', '#2980b9')
+        self.save_playlist_btn.pack(side=tk.LEFT, padx=5)
+
+        self.loading_frame = tk.Frame(main_frame, bg='#1a1a2e')
+        self.loading_label = tk.Label(self.loading_frame, text="⟳ Loading...", 
+                                     font=('Arial', 12), fg='#00ff88', bg='#1a1a2e')
+        self.loading_label.pack()
+        self.import_status_label = tk.Label(self.loading_frame, text="", 
+                                           font=('Arial', 10), fg='#cccccc', bg='#1a1a2e')
+        self.cancel_import_btn = self.create_animated_button(self.loading_frame, "CANCEL", 
+                                                            self.cancel_import, '#95a5a6', '#7f8c8d')
+        
+        self.update_audio_controls()
+
+    def update_audio_controls(self):
+        state = tk.NORMAL if self.engine.audio_available else tk.DISABLED
+        for button in (self.prev_btn, self.play_btn, self.stop_btn, self.next_btn):
+            button.config(state=state)
+    
+    def create_animated_button(self, parent, text, command, color1, color2):
+        btn = tk.Button(parent, text=text, command=command,
+                       bg=color1, fg='white', font=('Arial', 10, 'bold'),
+                       relief=tk.FLAT, padx=20, pady=8, cursor='hand2',
+                       borderwidth=0, highlightthickness=0)
+        btn.original_color = color1
+        btn.hover_color = color2
+        btn.current_color = color1
+        btn.bind("<Enter>", lambda e: self.start_hover_animation(btn, True))
+        btn.bind("<Leave>", lambda e: self.start_hover_animation(btn, False))
+        return btn
+    
+    def start_hover_animation(self, button, entering):
+        target_color = button.hover_color if entering else button.original_color
+        button.current_color = target_color
+        button.config(bg=target_color)
+    
+    def start_animations(self):
+        self.animations.register("title", 100, self.animate_title, widget=self.title_label)
+        self.animations.register("spinner", 80, self.animate_spinner, widget=self.spinner_label,
+                                 active=lambda: self.spinner_frames and self.engine.is_playing and not self.engine.is_paused)
+        self.animations.register("loading", 200, self.animate_loading, widget=self.loading_frame)
+        self.animations.register("pulse", 1000, self.pulse_current_song, widget=self.current_song_label,
+                                 active=lambda: self.engine.is_playing)
+        self.playback_state_changed()
+
+    def playback_state_changed(self):
+        if not (self.spinner_frames and self.engine.is_playing and not self.engine.is_paused):
+            icon = "⏸️" if self.engine.is_paused else "⏹️"
+            self.spinner_label.config(image="", text=icon, font=('Arial', 30), fg='#cccccc')
+        self.animations.wake()
+    
+    def animate_title(self):
+        self.pulse_phase += 0.1
+        intensity = int(128 + 127 * math.sin(self.pulse_phase))
+        color = f"#{intensity:02x}ff88"
+        self.title_label.config(fg=color)
+
+    # -------------------- GIF spinner --------------------
+    def load_spinner_gif(self, nailong_gif):
+        try:
+            self.spinner_frames = SpinnerFrames(nailong_gif, (120, 120))
+            self.spinner_index = 0
+        except Exception as e:
+            print("Could not load GIF:", e)
+            self.spinner_frames = []
+        startup_mark("spinner GIF")
+        self.playback_state_changed()
+
+    def animate_spinner(self):
+        index = self.spinner_index
+        self.spinner_label.config(image=self.spinner_frames[index], text="")
+        self.spinner_index = (index + 1) % len(self.spinner_frames)
+        return self.spinner_frames.duration(index)
+    # -----------------------------------------------------
+
+    def animate_loading(self):
+        self.loading_angle += 30
+        if self.loading_angle >= 360:
+            self.loading_angle = 0
+        rotation_chars = ['⟳', '⟲', '⟳', '⟲']
+        char_index = (self.loading_angle // 90) % len(rotation_chars)
+        self.loading_label.config(text=f"{rotation_chars[char_index]} Loading...")
+    
+    def show_loading(self, show=True):
+        if show:
+            self.loading_frame.pack(pady=10)
+            self.animations.wake()
+        else:
+            self.loading_frame.pack_forget()
+    
+    def add_music_files(self):
+        # Tk dialogs must run on the Tk thread
+        file_types = [
+            ("Audio Files", "*.mp3 *.wav *.ogg *.m4a"),
+            ("All Files", "*.*")
+        ]
+        files = filedialog.askopenfilenames(title="Select Music", filetypes=file_types)
+        if files:
+            self.engine.enqueue(files)
+            messagebox.showinfo("Success", f"Added {len(files)} music file(s) to queue!")
+
+    def add_music_folder(self):
+        if self.importer is not None:
+            messagebox.showinfo("Import Running", "An import is already in progress.")
+            return
+        folder = filedialog.askdirectory(title="Select Music Folder")
+        if folder:
+            self.start_import(FolderImporter(folder), self.report_import)
+
+    def start_import(self, importer, on_done, cancellable=True):
+        self.importer = importer
+        self.import_added = 0
+        self.import_done = on_done
+        importer.start()
+        self.import_status_label.config(text="Scanning...")
+        self.import_status_label.pack()
+        if cancellable:
+            self.cancel_import_btn.pack(pady=5)
+        self.show_loading(True)
+        self.poll_import()
+
+    def poll_import(self):
+        importer = self.importer
+        # at most ~30 ms of enqueueing per tick, so huge imports stream in
+        # without freezing the window
+        deadline = time.perf_counter() + 0.03
+        while time.perf_counter() < deadline:
+            paths = importer.drain(importer.BATCH_SIZE)
+            if not paths:
+                break
+            if not importer.cancelled.is_set():
+                self.engine.enqueue(paths)
+                self.import_added += len(paths)
+        self.import_status_label.config(text=f"{self.import_added} song(s) added, {importer.progress()}")
+        if not importer.finished():
+            self.root.after(50, self.poll_import)
+            return
+        self.importer = None
+        self.import_status_label.pack_forget()
+        self.cancel_import_btn.pack_forget()
+        self.show_loading(False)
+        self.import_done(importer)
+
+    def report_import(self, importer):
+        if importer.cancelled.is_set():
+            messagebox.showinfo("Import Cancelled", f"Import cancelled after adding {self.import_added} music file(s).")
+        else:
+            messagebox.showinfo("Success", f"Added {self.import_added} music file(s) to queue!")
+
+    def cancel_import(self):
+        if self.importer is not None:
+            self.importer.cancel()
+
+    # -------------------- playlists and sessions --------------------
+    def open_playlist(self):
+        if self.importer is not None:
+            messagebox.showinfo("Import Running", "An import is already in progress.")
+            return
+        path = filedialog.askopenfilename(title="Open Playlist",
+                                          filetypes=[("Playlists", "*.m3u *.m3u8"), ("All Files", "*.*")])
+        if path:
+            self.start_import(PlaylistLoader(read_m3u(path), os.path.basename(path)), self.report_import)
+
+    def save_playlist(self):
+        if not self.music_queue:
+            messagebox.showinfo("Empty Queue", "Queue is empty, nothing to save!")
+            return
+        path = filedialog.asksaveasfilename(title="Save Playlist", defaultextension=".m3u8",
+                                            filetypes=[("Playlists", "*.m3u8 *.m3u")])
+        if not path:
+            return
+        paths = list(self.music_queue)
+        errors = []
+        library = self.engine.library
+
+        def export():
+            try:
+                write_m3u(path, paths, library, library.connect() if library else None)
+            except (OSError, sqlite3.Error) as e:
+                errors.append(e)
+        thread = threading.Thread(target=export, daemon=True)
+        thread.start()
+        self.show_loading(True)
+        self.poll_export(thread, path, len(paths), errors)
+
+    def poll_export(self, thread, path, count, errors):
+        if thread.is_alive():
+            self.root.after(100, self.poll_export, thread, path, count, errors)
+            return
+        if self.importer is None:
+            self.show_loading(False)
+        if errors:
+            messagebox.showerror("Save Failed", f"Could not save playlist:\n{path}\n\n{errors[0]}")
+        else:
+            messagebox.showinfo("Saved", f"Saved {count} song(s) to {os.path.basename(path)}")
+
+    def load_paths(self, paths):
+        # files, folders and playlists from the command line; expand_paths()
+        # walks and reads them on the loader's thread
+        self.start_import(PlaylistLoader(expand_paths(paths), "command line"), lambda loader: None)
+
+    def restore_session(self, session, then=()):
+        # stream the saved queue in first, then whatever was on the command line
+        self.session = session
+        self.session_then = list(then)
+        try:
+            loader = session.restore()
+        except OSError as e:
+            print("Could not restore session:", e)
+            self.session = None
+            if self.session_then:
+                self.load_paths(self.session_then)
+            return
+        # not cancellable: finish_restore() drops the old journal, so a
+        # half-loaded queue would be all that's left next time
+        self.start_import(loader, self.session_restored, cancellable=False)
+        self.save_session_position()
+
+    def session_restored(self, loader):
+        self.session.finish_restore()
+        if self.session.current and not self.engine.current_song:
+            self.engine.cue(*self.session.current)
+        if self.session_then:
+            self.load_paths(self.session_then)
+            self.session_then = []
+
+    def save_session_position(self):
+        if self.engine.is_playing:
+            self.session.save_position()
+        self.root.after(5000, self.save_session_position)
+    # -----------------------------------------------------
+    
+    # -------------------- search --------------------
+    def run_search(self, reset=True):
+        text = self.search_var.get().strip()
+        if text:
+            # one past the limit tells "exactly 500" from "500 and more"
+            limit = SearchIndex.RESULT_LIMIT
+            results = self.engine.search_index.query(text, limit + 1)
+            self.search_more = len(results) > limit
+            self.queue_view.queue = results[:limit]
+        elif self.queue_view.queue is self.music_queue:
+            return
+        else:
+            self.queue_view.queue = self.music_queue
+            reset = True
+        if reset:
+            self.queue_view.clear()
+        else:
+            self.queue_view.refresh()
+        self.update_queue_count()
+
+    def queue_index(self, view_index):
+        # map a row of the (possibly filtered) main view to a queue position
+        if view_index is None or self.queue_view.queue is self.music_queue:
+            return view_index
+        try:
+            return self.music_queue.index(self.queue_view.queue[view_index])
+        except (IndexError, ValueError):
+            return None
+
+    def on_queue_double_click(self, event):
+        index = self.queue_index(self.queue_view.index_at(event.y))
+        if index is not None:
+            self.play_selected_from_queue(index)
+    # -----------------------------------------------------
+
+    # -------------------- instrumentation --------------------
+    def instrument(self, metrics):
+        # Must run before setup_ui() and start_animations() so buttons and
+        # the scheduler pick up the wrapped methods.
+        metrics.instrument(self, ["play_next_song", "play_pause_music", "stop_music", "next_song", "previous_song",
+                                  "cycle_shuffle", "cycle_repeat",
+                                  "remove_selected", "clear_queue", "add_music_files", "add_music_folder",
+                                  "open_playlist", "save_playlist",
+                                  "peek_queue", "play_selected_from_queue", "update_queue_display",
+                                  "poll_engine", "poll_import", "run_search", "animate_title",
+                                  "animate_spinner", "animate_loading", "pulse_current_song"])
+        metrics.instrument(self.animations, ["tick"], "animations.")
+        metrics.instrument(self.engine, ["start", "poll"], "engine.")
+        self.instrument_backend()
+        self.engine.subscribe(metrics.on_engine_event)
+        metrics.watch("audio_cache.", self.engine.cache_stats)
+
+    def instrument_backend(self):
+        if self.metrics and self.engine.audio_available:
+            self.metrics.instrument(self.engine.backend, ["load", "queue"], "mixer.")
+
+    def heartbeat(self, expected=None):
+        now = time.perf_counter()
+        if expected is not None:
+            self.metrics.record("event_loop_lag", max(0.0, (now - expected) * 1e3))
+        self.root.after(100, self.heartbeat, now + 0.1)
+
+    def toggle_metrics_overlay(self):
+        if self.metrics_overlay is not None:
+            self.metrics_overlay.destroy()
+            self.metrics_overlay = None
+            return
+        self.metrics_overlay = tk.Toplevel(self.root)
+        self.metrics_overlay.title("📈 Metrics")
+        self.metrics_overlay.configure(bg='#0a0a0a')
+        self.metrics_overlay.attributes('-topmost', True)
+        self.metrics_overlay.protocol("WM_DELETE_WINDOW", self.toggle_metrics_overlay)
+        label = tk.Label(self.metrics_overlay, font=('Courier', 9), fg='#00ff88', bg='#0a0a0a',
+                         justify=tk.LEFT, anchor='nw')
+        label.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.update_metrics_overlay(self.metrics_overlay, label)
+
+    def update_metrics_overlay(self, window, label):
+        if window is not self.metrics_overlay:
+            return
+        label.config(text=self.metrics.format())
+        self.root.after(500, self.update_metrics_overlay, window, label)
+
+    def dump_metrics(self):
+        try:
+            self.metrics.dump(self.metrics_dump)
+        except OSError as e:
+            print("Could not write metrics:", e)
+        self.root.after(5000, self.dump_metrics)
+    # -----------------------------------------------------
+
+    def on_engine_event(self, event, data):
+        if event == "queue_changed":
+            self.update_queue_display(data["change"], *data["args"])
+        elif event == "track_changed":
+            if data["path"] is None:
+                self.current_song_label.config(text="No song selected", fg='#cccccc')
+            else:
+                self.current_song_label.config(text=self.display_names[data["path"]], fg='#00ff88')
+        elif event == "state_changed":
+            self.play_btn.config(text="⏸️ PAUSE" if self.engine.is_playing else "▶️ PLAY")
+            self.update_mode_buttons()
+            self.playback_state_changed()
+        elif event == "metadata_changed":
+            updated = set(data["paths"])
+            for path in updated:
+                self.display_names.pop(path, None)
+            self.update_queue_display()
+            if self.engine.current_song in updated:
+                self.current_song_label.config(text=self.display_names[self.engine.current_song])
+        elif event == "error":
+            messagebox.showerror("Playback Error", f"Could not play file:\n{data['path']}\n\n{data['message']}")
+        elif event == "audio_changed":
+            self.update_audio_controls()
+            self.instrument_backend()
+            startup_mark("audio ready")
+
+    def poll_engine(self):
+        self.engine.poll()
+        if self.control:
+            self.control.process()
+        # every 10 ms only while something is going on; stopped or idle, the
+        # poll just picks up background results and can wake Tk far less
+        busy = (self.engine.is_playing or self.importer is not None or self.engine.backend_results is not None
+                or (self.control is not None and self.control.has_work()))
+        self.root.after(self.POLL_BUSY_MS if busy else self.POLL_IDLE_MS, self.poll_engine)
+
+    def update_queue_display(self, change="refresh", *args):
+        for view in self.queue_views:
+            if view.queue is self.music_queue:
+                getattr(view, change)(*args)
+        if self.queue_view.queue is not self.music_queue:
+            self.run_search(reset=False)
+        self.update_queue_count()
+
+    def update_queue_count(self):
+        count = len(self.music_queue)
+        text = f"{count} song{'s' if count != 1 else ''}"
+        if self.queue_view.queue is not self.music_queue:
+            text = f"{len(self.queue_view.queue)}{'+' if self.search_more else ''} of {text}"
+        self.queue_count_label.config(text=f"({text})")
+        self.queue_count_label.config(fg='#00ff88' if count > 0 else '#cccccc')
+    
+    def change_volume(self, value):
+        self.engine.set_volume(float(value) / 100)
+    
+    def peek_queue(self):
+        if not self.music_queue:
+            messagebox.showinfo("No Songs", "The queue is empty!")
+            return
+        peek_window = tk.Toplevel(self.root)
+        peek_window.title("🔍 Peek Queue")
+        peek_window.geometry("500x400")
+        peek_window.configure(bg='#1a1a2e')
+        peek_window.transient(self.root)
+        peek_window.grab_set()
+        peek_window.attributes('-alpha', 0.0)
+        self.fade_in_window(peek_window)
+        header_frame = tk.Frame(peek_window, bg="#252b3d", height=60)
+        header_frame.pack(fill=tk.X, padx=10, pady=10)
+        header_frame.pack_propagate(False)
+        tk.Label(header_frame, text="🎼 QUEUE BROWSER", 
+                font=('Arial', 14, 'bold'), fg='#00ff88', bg='#16213e').pack(pady=15)
+        listbox_frame = tk.Frame(peek_window, bg='#1a1a2e')
+        listbox_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        peek_view = VirtualQueueView(listbox_frame, self.music_queue, self.display_names,
+                                     "{index:02d}. ♪ {name}",
+                                     bg='#2d2d2d', fg='#ffffff',
+                                     selectbackground='#00ff88', selectforeground='#000000',
+                                     font=('Arial', 11), relief=tk.FLAT, bd=0,
+                                     highlightthickness=0, activestyle='none')
+        peek_view.pack()
+        self.queue_views.append(peek_view)
+        def on_destroy(event):
+            if event.widget is peek_window and peek_view in self.queue_views:
+                self.queue_views.remove(peek_view)
+        peek_window.bind("<Destroy>", on_destroy)
+        instruction_frame = tk.Frame(peek_window, bg='#16213e')
+        instruction_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        tk.Label(instruction_frame, text="💡 Double-click a song to play it directly", 
+                font=('Arial', 10), fg='#cccccc', bg='#16213e').pack(pady=10)
+        def on_double_click(event):
+            index = peek_view.index_at(event.y)
+            if index is not None:
+                self.play_selected_from_queue(index)
+                self.fade_out_window(peek_window)
+        peek_view.bind("<Double-Button-1>", on_double_click)
+    
+    def fade_in_window(self, window, alpha=0.0):
+        alpha += 0.1
+        window.attributes('-alpha', alpha)
+        if alpha < 1.0:
+            self.root.after(50, lambda: self.fade_in_window(window, alpha))
+    
+    def fade_out_window(self, window, alpha=1.0):
+        alpha -= 0.1
+        window.attributes('-alpha', alpha)
+        if alpha > 0.0:
+            self.root.after(50, lambda: self.fade_out_window(window, alpha))
+        else:
+            window.destroy()
+    
+    def play_selected_from_queue(self, index):
+        self.engine.play_index(index)
+    
+    def pulse_current_song(self):
+        current_fg = self.current_song_label.cget('fg')
+        self.current_song_label.config(fg='#ffffff' if current_fg == '#00ff88' else '#00ff88')
+    
+    def play_pause_music(self):
+        if not self.engine.audio_available:
+            messagebox.showwarning("Audio Unavailable", "Audio device not initialized. Playback disabled.")
+            return
+        if not self.music_queue and not self.engine.current_song:
+            messagebox.showwarning("No Music", "Please add music to the queue first!")
+            return
+        self.engine.play_pause()
+    
+    def play_next_song(self):
+        if self.music_queue:
+            self.engine.play_next()
+        else:
+            messagebox.showinfo("Queue Empty", "No more songs in queue!")
+    
+    def stop_music(self):
+        self.engine.stop()
+    
+    def next_song(self):
+        if self.music_queue:
+            self.engine.next()
+        else:
+            messagebox.showinfo("Queue Empty", "No more songs in queue!")
+
+    def cycle_shuffle(self):
+        modes = self.engine.SHUFFLE_MODES
+        self.engine.set_shuffle(modes[(modes.index(self.engine.shuffle) + 1) % len(modes)])
+
+    def cycle_repeat(self):
+        modes = self.engine.REPEAT_MODES
+        self.engine.set_repeat(modes[(modes.index(self.engine.repeat) + 1) % len(modes)])
+
+    def update_mode_buttons(self):
+        self.shuffle_btn.config(text=f"🔀 SHUFFLE: {self.engine.shuffle.upper()}")
+        self.repeat_btn.config(text=f"🔁 REPEAT: {self.engine.repeat.upper()}")
+
+    def previous_song(self):
+        if not self.engine.previous() and not self.engine.history:
+            messagebox.showinfo("No History", "No previous song to go back to!")
+    
+    def remove_selected(self):
+        index = self.queue_index(self.queue_view.selected_index())
+        if index is not None:
+            removed_song = self.engine.dequeue(index)
+            song_name = self.display_names[removed_song]
+            messagebox.showinfo("Removed", f"♪ Removed: {song_name}")
+        else:
+            messagebox.showwarning("No Selection", "Please select a song to remove!")
+    
+    def clear_queue(self):
+        if self.music_queue:
+            if messagebox.askyesno("Clear Queue", "🗑️ Are you sure you want to clear the entire queue?"):
+                self.engine.clear_queue()
+                messagebox.showinfo("Cleared", "✨ Queue cleared!")
+        else:
+            messagebox.showinfo("Empty Queue", "Queue is already empty!")
+
+
+def create_engine(fake_audio=False, audio_async=False, cache_mb=256, skip_duplicates=False):
+    backend = None
+    make_backend = functools.partial(PygameBackend, int(cache_mb * 1e6))
+    if fake_audio:
+        backend = FakeBackend()
+    elif not audio_async:
+        try:
+            backend = make_backend()
+        except Exception as e:
+            print("Warning: pygame.mixer.init() failed:", e)
+    try:
+        library = LibraryIndex()
+    except (sqlite3.Error, OSError) as e:
+        library = None
+        print("Warning: library index unavailable:", e)
+    analyzer = hasher = None
+    if HAVE_NUMPY and library is not None:
+        analyzer = LoudnessAnalyzer(library.db_path)
+    if library is not None:
+        hasher = DuplicateDetector(library.db_path)
+    engine = PlayerEngine(backend, library, analyzer, hasher)
+    engine.skip_duplicates = skip_duplicates
+    if audio_async and not fake_audio:
+        engine.init_backend_async(make_backend)
+    return engine
+
+
+def expand_paths(paths):
+    # Lazy, so the GUI can hand it to a PlaylistLoader and walk folders off
+    # the Tk thread. Always absolute: the paths outlive this working
+    # directory in the session, the library index and exported playlists.
+    for path in map(os.path.abspath, paths):
+        if os.path.isdir(path):
+            for folder, dirs, names in os.walk(path):
+                dirs.sort()
+                yield from (os.path.join(folder, name) for name in sorted(names)
+                            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS)
+        elif os.path.splitext(path)[1].lower() in PLAYLIST_EXTENSIONS:
+            yield from read_m3u(path)
+        else:
+            yield path
+
+
+# -------------------- headless mode --------------------
+HEADLESS_HELP = """commands: add <path> | play | pause | next | prev | stop | remove <n> | clear
+          shuffle <off|random|artist> | repeat <off|all|one> | volume <0-100>
+          list | search <text> | save <playlist.m3u8> | status | quit"""
+
+
+def run_command(engine, line):
+    name, _, arg = line.partition(" ")
+    arg = arg.strip()
+    if name in ("quit", "exit"):
+        return False
+    if name == "add":
+        engine.enqueue(expand_paths([arg]))
+    elif name == "play":
+        if not engine.is_playing:
+            engine.play_pause()
+    elif name == "pause":
+        if engine.is_playing:
+            engine.play_pause()
+    elif name == "next":
+        if not engine.next():
+            print("queue empty")
+    elif name == "prev":
+        if not engine.previous():
+            print("no history")
+    elif name == "stop":
+        engine.stop()
+    elif name == "remove":
+        index = int(arg) - 1
+        if not 0 <= index < len(engine.music_queue):
+            raise IndexError(f"no queue entry {arg}")
+        print("removed:", engine.dequeue(index))
+    elif name == "clear":
+        engine.clear_queue()
+    elif name == "volume":
+        engine.set_volume(float(arg) / 100)
+    elif name == "shuffle":
+        engine.set_shuffle(arg or "random")
+    elif name == "repeat":
+        engine.set_repeat(arg or "all")
+    elif name == "list":
+        for i, path in enumerate(engine.music_queue, 1):
+            print(f"{i:02d}. {path}")
+    elif name == "search":
+        limit = SearchIndex.RESULT_LIMIT
+        results = engine.search_index.query(arg, limit + 1)
+        for path in results[:limit]:
+            print(path)
+        print(f"{min(len(results), limit)}{'+' if len(results) > limit else ''} match(es)")
+    elif name == "save":
+        write_m3u(arg, list(engine.music_queue), engine.library)
+        print(f"saved {len(engine.music_queue)} song(s) to {arg}")
+    elif name == "status":
+        state = "playing" if engine.is_playing else "paused" if engine.is_paused else "stopped"
+        print(f"{state}: {engine.current_song or '-'} ({len(engine.music_queue)} queued,"
+              f" shuffle {engine.shuffle}, repeat {engine.repeat}, {len(engine.duplicates)} duplicates"
+              f"{' skipped' if engine.skip_duplicates else ''})")
+        cache = engine.cache_stats()
+        if cache:
+            print(f"audio cache: {cache['tracks']} tracks, {cache['mb']:.0f}/{cache['budget_mb']:.0f} MB,"
+                  f" {cache['hit_rate']:.0%} hits ({cache['hits']}/{cache['hits'] + cache['misses']})")
+    else:
+        print(HEADLESS_HELP)
+    return True
+
+
+def run_headless(engine, paths, control=None):
+    if not engine.audio_available:
+        print("Audio device not initialized. Playback disabled.")
+        return 1
+
+    def report(event, data):
+        if event == "track_changed":
+            print("now playing:", data["path"] or "-", flush=True)
+        elif event == "error":
+            print(f"error: {data['path']}: {data['message']}", flush=True)
+    engine.subscribe(report)
+
+    commands = queue.Queue()
+
+    def read_commands():
+        for line in sys.stdin:
+            commands.put(line.strip())
+        commands.put(None)
+    threading.Thread(target=read_commands, daemon=True).start()
+
+    engine.enqueue(expand_paths(paths))
+    engine.play_next()
+    stdin_open = True
+    quit_requested = threading.Event()
+    if control:
+        control.on_quit = quit_requested.set
+    try:
+        # quit once stdin is closed and the queue has played out, or, with a
+        # control socket, when asked to
+        while not quit_requested.is_set() and (stdin_open or control or engine.is_playing or engine.is_paused):
+            engine.poll()
+            if control:
+                control.process()
+            try:
+                line = commands.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            if line is None:
+                stdin_open = False
+            elif line:
+                try:
+                    if not run_command(engine, line):
+                        break
+                except (ValueError, IndexError, OSError) as e:
+                    print("error:", e)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if control:
+            control.close()
+        engine.shutdown()
+    return 0
+# -----------------------------------------------------
+
+
+# -------------------- remote control --------------------
+def default_control_address():
+    if hasattr(socket, "AF_UNIX"):
+        return os.path.join(CACHE_DIR, "control.sock")
+    return "127.0.0.1:47800"
+
+
+def parse_control_address(address):
+    # "host:port" is TCP, anything else is a Unix socket path. Commands
+    # aren't authenticated, so TCP stays on the loopback interface.
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        host = host or "127.0.0.1"
+        if host != "localhost":
+            import ipaddress
+            try:
+                loopback = ipaddress.IPv4Address(host).is_loopback
+            except ValueError:
+                loopback = False
+            if not loopback:
+                raise OSError(f"the control socket only listens on localhost, not {host}")
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+class ControlServer:
+    # JSON-lines control socket for other processes. Each line is a command
+    # object, e.g. {"cmd": "enqueue", "paths": [...]}, or a list of them; each
+    # gets one response line back, {"ok": true, "result": ...} or
+    # {"ok": false, "error": ...}, in order. After {"cmd": "subscribe"} the
+    # connection also receives engine events as {"event": ...} lines.
+    #
+    # asyncio runs the sockets on its own thread. Commands wait in a queue
+    # until process() runs them on the engine's thread (the Tk thread), and
+    # back-to-back enqueues are merged into one engine.enqueue() call, so a
+    # burst of 10k of them costs one queue refresh.
+    COMMANDS = ("enqueue", "play", "pause", "toggle", "next", "previous", "stop", "remove", "clear",
+                "volume", "shuffle", "repeat", "status", "list", "quit")
+    MAX_LINE = 1 << 24
+    MAX_BUFFER = 1 << 20   # subscribers further behind than this are dropped
+
+    def __init__(self, engine, address=None):
+        import asyncio
+        self.asyncio = asyncio
+        self.engine = engine
+        self.address = address or default_control_address()
+        self.commands = queue.Queue()
+        self.connections = set()
+        self.subscribers = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+        self.on_quit = None
+        engine.subscribe(self.on_engine_event)
+
+    # -------------------- socket thread --------------------
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error:
+            raise self.error
+
+    def run(self):
+        self.loop = self.asyncio.new_event_loop()
+        self.asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(self.listen())
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self.shutdown())
+        self.loop.close()
+
+    async def shutdown(self):
+        # closing the sockets ends each handle() the normal way
+        self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+        tasks = self.asyncio.all_tasks() - {self.asyncio.current_task()}
+        if tasks:
+            done, pending = await self.asyncio.wait(tasks, timeout=1)
+            for task in pending:
+                task.cancel()
+
+    async def listen(self):
+        family, target = parse_control_address(self.address)
+        if family == socket.AF_INET:
+            return await self.asyncio.start_server(self.handle, *target, limit=self.MAX_LINE)
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        if os.path.exists(target):
+            probe = socket.socket(socket.AF_UNIX)
+            try:
+                probe.connect(target)
+            except OSError:
+                os.remove(target)   # left behind by a player that crashed
+            else:
+                raise OSError(f"another player is already listening on {target}")
+            finally:
+                probe.close()
+        server = await self.asyncio.start_unix_server(self.handle, target, limit=self.MAX_LINE)
+        os.chmod(target, 0o600)
+        return server
+
+    async def handle(self, reader, writer):
+        # Responses go out from a separate task so pipelined commands don't
+        # each wait a Tk tick before the next line is read.
+        responses = self.asyncio.Queue()
+        sender = self.asyncio.ensure_future(self.send_responses(responses, writer))
+        self.connections.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                responses.put_nowait(self.dispatch(line, writer))
+        except (ConnectionError, ValueError) as e:   # ValueError: line over MAX_LINE
+            print("Control connection dropped:", e)
+        finally:
+            self.connections.discard(writer)
+            self.subscribers.discard(writer)
+            responses.put_nowait(None)
+            await sender
+            writer.close()
+
+    async def send_responses(self, responses, writer):
+        while True:
+            pending = await responses.get()
+            if pending is None:
+                return
+            try:
+                writer.write(json.dumps(await pending).encode() + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                return
+
+    def dispatch(self, line, writer):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return self.done({"ok": False, "error": f"invalid JSON: {e}"})
+        if isinstance(request, list):
+            return self.asyncio.gather(*(self.submit(command, writer) for command in request))
+        return self.submit(request, writer)
+
+    def submit(self, command, writer):
+        if not isinstance(command, dict):
+            return self.done({"ok": False, "error": "a command must be a JSON object"})
+        if command.get("cmd") == "subscribe":
+            self.subscribers.add(writer)
+            return self.done({"ok": True, "result": None})
+        future = Future()
+        self.commands.put((command, future))
+        return self.asyncio.wrap_future(future)
+
+    def done(self, response):
+        future = self.loop.create_future()
+        future.set_result(response)
+        return future
+
+    def broadcast(self, message):
+        line = json.dumps(message).encode() + b"\n"
+        for writer in list(self.subscribers):
+            if writer.transport.get_write_buffer_size() > self.MAX_BUFFER:
+                self.subscribers.discard(writer)
+                writer.close()
+            else:
+                writer.write(line)
+
+    def close(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=2)
+        family, target = parse_control_address(self.address)
+        if family != socket.AF_INET and self.server is not None:
+            try:
+                os.remove(target)
+            except OSError:
+                pass
+
+    # -------------------- engine thread --------------------
+    def has_work(self):
+        return not self.commands.empty()
+
+    def on_engine_event(self, event, data):
+        if not self.subscribers:
+            return
+        if event == "queue_changed":
+            message = {"event": event, "change": data["change"], "length": len(self.engine.music_queue)}
+        elif event == "state_changed":
+            message = {"event": event, "playing": self.engine.is_playing, "paused": self.engine.is_paused,
+                       "shuffle": self.engine.shuffle, "repeat": self.engine.repeat}
+        elif event == "metadata_changed":
+            message = {"event": event, "count": len(data["paths"])}
+        else:
+            message = {"event": event, **data}
+        self.loop.call_soon_threadsafe(self.broadcast, message)
+
+    def process(self):
+        # only what was queued when we started, so a flood can't starve Tk
+        paths, futures = [], []
+        for _ in range(self.commands.qsize()):
+            command, future = self.commands.get_nowait()
+            if command.get("cmd") == "enqueue" and self.valid_paths(command.get("paths")):
+                paths += command["paths"]
+                futures.append((future, len(command["paths"])))
+                continue
+            self.flush_enqueue(paths, futures)
+            paths, futures = [], []
+            try:
+                future.set_result({"ok": True, "result": self.run_command(command)})
+            except KeyError as e:
+                future.set_result({"ok": False, "error": f"missing argument {e}"})
+            except (ValueError, TypeError, IndexError) as e:
+                future.set_result({"ok": False, "error": str(e)})
+        self.flush_enqueue(paths, futures)
+
+    def flush_enqueue(self, paths, futures):
+        if futures:
+            self.engine.enqueue(paths)
+            for future, count in futures:
+                future.set_result({"ok": True, "result": {"queued": count}})
+
+    def valid_paths(self, paths):
+        return isinstance(paths, list) and all(isinstance(path, str) for path in paths)
+
+    def run_command(self, command):
+        name = command.get("cmd")
+        engine = self.engine
+        if name not in self.COMMANDS:
+            raise ValueError(f"unknown command: {name!r}")
+        if name in ("play", "pause", "toggle", "next", "previous") and not engine.audio_available:
+            raise ValueError("audio device not initialized")
+        if name == "enqueue":
+            raise TypeError("enqueue needs a list of paths")
+        if name == "play":
+            if not engine.is_playing:
+                engine.play_pause()
+        elif name == "pause":
+            if engine.is_playing:
+                engine.play_pause()
+        elif name == "toggle":
+            engine.play_pause()
+        elif name == "next":
+            return engine.next()
+        elif name == "previous":
+            return engine.previous()
+        elif name == "stop":
+            engine.stop()
+        elif name == "remove":
+            index = int(command["index"])
+            if not 0 <= index < len(engine.music_queue):
+                raise IndexError(f"no queue entry {index}")
+            return engine.dequeue(index)
+        elif name == "clear":
+            engine.clear_queue()
+        elif name == "volume":
+            engine.set_volume(min(100.0, max(0.0, float(command["value"]))) / 100)
+        elif name == "shuffle":
+            engine.set_shuffle(command["mode"])
+        elif name == "repeat":
+            engine.set_repeat(command["mode"])
+        elif name == "status":
+            return {"playing": engine.is_playing, "paused": engine.is_paused, "current": engine.current_song,
+                    "position": engine.position(), "queued": len(engine.music_queue), "volume": engine.volume * 100,
+                    "shuffle": engine.shuffle, "repeat": engine.repeat,
+                    "duplicates": len(engine.duplicates), "skip_duplicates": engine.skip_duplicates,
+                    "audio_cache": engine.cache_stats()}
+        elif name == "list":
+            start = int(command.get("start", 0))
+            return engine.music_queue[start:start + int(command.get("count", 100))]
+        elif name == "quit":
+            if self.on_quit:
+                self.on_quit()
+        return None
+
+
+class ControlError(Exception):
+    pass
+
+
+class ControlClient:
+    # Blocking client for scripts and daemons:
+    #   client = ControlClient()
+    #   client.call("enqueue", paths=["/music/a.mp3"])
+    #   client.batch([{"cmd": "clear"}, {"cmd": "play"}])
+    # send()/receive() pipeline many commands without waiting for each reply.
+    def __init__(self, address=None, timeout=10):
+        family, target = parse_control_address(address or default_control_address())
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(target)
+        self.file = self.sock.makefile("rwb")
+        self.pending_events = deque()
+
+    def send(self, command):
+        self.file.write(json.dumps(command).encode() + b"\n")
+
+    def receive(self):
+        self.file.flush()
+        while True:
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError("control server closed the connection")
+            message = json.loads(line)
+            if isinstance(message, dict) and "event" in message:
+                self.pending_events.append(message)
+            else:
+                return message
+
+    def call(self, cmd, **args):
+        self.send({"cmd": cmd, **args})
+        return self.result(self.receive())
+
+    def batch(self, commands):
+        self.send(list(commands))
+        return [self.result(response) for response in self.receive()]
+
+    def result(self, response):
+        if not response["ok"]:
+            raise ControlError(response["error"])
+        return response["result"]
+
+    def events(self):
+        self.call("subscribe")
+        self.sock.settimeout(None)
+        while True:
+            while self.pending_events:
+                yield self.pending_events.popleft()
+            line = self.file.readline()
+            if not line:
+                return
+            self.pending_events.append(json.loads(line))
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def send_command(address, name, args):
+    # python MusicPlayerHehe.py --send <command> [args...]
+    client = ControlClient(address)
+    try:
+        if name == "events":
+            for event in client.events():
+                print(json.dumps(event), flush=True)
+            return
+        command = {"cmd": name}
+        if name == "enqueue":
+            command["paths"] = list(expand_paths(args))
+        elif name == "remove":
+            command["index"] = int(args[0])
+        elif name == "volume":
+            command["value"] = float(args[0])
+        elif name in ("shuffle", "repeat"):
+            command["mode"] = args[0]
+        client.send(command)
+        response = client.receive()
+        print(json.dumps(response.get("result") if response["ok"] else response))
+        return 0 if response["ok"] else 1
+    finally:
+        client.close()
+# -----------------------------------------------------
+
+
+def start_control(engine, address):
+    if address is None:
+        return None
+    control = ControlServer(engine, address or None)
+    try:
+        control.start()
+    except OSError as e:
+        print("Warning: control socket unavailable:", e)
+        return None
+    return control
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tkinter music player")
+    parser.add_argument("paths", nargs="*", help="songs or folders to queue")
+    parser.add_argument("--headless", action="store_true", help="run without Tk, reading commands from stdin")
+    parser.add_argument("--fake-audio", action="store_true", help="use a silent fake mixer instead of pygame")
+    parser.add_argument("--metrics", action="store_true",
+                        help="time callbacks and event-loop lag; F12 toggles the overlay")
+    parser.add_argument("--metrics-dump", metavar="PATH",
+                        help="write metrics every 5 s to PATH (.json or .csv); implies --metrics")
+    parser.add_argument("--session", default=SESSION_PATH, help="where the queue is saved between runs")
+    parser.add_argument("--no-session", action="store_true", help="don't restore or save the queue")
+    parser.add_argument("--control", nargs="?", const="", metavar="ADDRESS",
+                        help="accept commands on a Unix socket path or localhost host:port"
+                             " (default ~/.cache/music-player/control.sock)")
+    parser.add_argument("--send", metavar="COMMAND",
+                        help="send a command (enqueue, play, pause, next, volume, events, ...) to a"
+                             " player started with --control; paths are its arguments")
+    parser.add_argument("--audio-cache-mb", type=float, default=256,
+                        help="memory for decoded tracks, so replays and PREV start instantly (0 turns it off)")
+    parser.add_argument("--skip-duplicates", action="store_true",
+                        help="flag queued files with the same audio as an earlier one and don't play them")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each import and init step takes until the window is up")
+    args = parser.parse_args()
+    global PROFILE_STARTUP
+    PROFILE_STARTUP = args.profile_startup
+    startup_mark("imports")
+    if args.send:
+        try:
+            sys.exit(send_command(args.control or None, args.send, args.paths))
+        except OSError as e:
+            sys.exit(f"Could not reach the player: {e}")
+    if args.headless:
+        engine = create_engine(args.fake_audio, cache_mb=args.audio_cache_mb, skip_duplicates=args.skip_duplicates)
+        sys.exit(run_headless(engine, args.paths, start_control(engine, args.control)))
+    root = tk.Tk()
+    startup_mark("Tk()")
+    root.resizable(True, True)
+    root.minsize(600, 500)
+    root.update_idletasks()
+    x = (root.winfo_screenwidth() // 2) - (800 // 2)
+    y = (root.winfo_screenheight() // 2) - (600 // 2)
+    root.geometry(f"800x600+{x}+{y}")
+    metrics = Metrics() if args.metrics or args.metrics_dump else None
+    engine = create_engine(args.fake_audio, audio_async=True, cache_mb=args.audio_cache_mb,
+                           skip_duplicates=args.skip_duplicates)
+    startup_mark("engine")
+    app = MusicPlayerGUI(root, engine, metrics, args.metrics_dump)
+    app.control = start_control(engine, args.control)
+    if app.control:
+        app.control.on_quit = root.quit
+    startup_mark("build UI")
+    if PROFILE_STARTUP:
+        root.update()
+        startup_mark("first paint")
+    if not args.no_session:
+        app.restore_session(QueueSession(engine, args.session), args.paths)
+    elif args.paths:
+        app.load_paths(args.paths)
+    try:
+        root.mainloop()
+    except KeyboardInterrupt:
+        print("\nApplication closed by user")
+    finally:
+        if app.session:
+            app.session.close()
+        if app.control:
+            app.control.close()
+        app.engine.shutdown()
+        if app.metrics_dump:
+            app.metrics.dump(app.metrics_dump)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+# Benchmark suite for MusicPlayerHehe.py. Uses SDL's dummy audio driver, so
+# it runs without a sound card; rendering and first-paint numbers need a
+# display and are marked as skipped without one.
+#
+#     python bench.py [--out benchmark.json] [--sizes 1000,10000,...]
+import argparse
+import tkinter as tk
+from collections import deque
+import os
+import threading
+import time
+import json
+import platform
+import subprocess
+import tempfile
+import random
+import sys
+import struct
+import socket
+import wave
+
+from MusicPlayerHehe import (HAVE_NUMPY, TrackQueue, SpinnerFrames, LoudnessAnalyzer, DuplicateDetector,
+                             SearchIndex, search_text, PygameBackend, FakeBackend, PlayerEngine,
+                             MusicPlayerGUI, ControlServer, ControlClient)
+
+# SDL's dummy driver still runs the mixer thread in real time
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+
+def dummy_backend():
+    try:
+        return PygameBackend()
+    except Exception as e:
+        print("Warning: no pygame mixer, timing with FakeBackend:", e)
+        return FakeBackend()
+
+
+def silent_tracks(folder, count, length):
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"silence_{i}.wav")
+        with wave.open(path, "wb") as w:
+            w.setnchannels(2)
+            w.setsampwidth(2)
+            w.setframerate(44100)
+            w.writeframes(b"\0\0\0\0" * int(44100 * length))
+        paths.append(path)
+    return paths
+
+
+def benchmark_queue(sizes=(1_000, 50_000, 200_000), ops=200):
+    results = []
+    for size in sizes:
+        paths = [f"/music/track_{i:06d}.mp3" for i in range(size)]
+        # every position stays valid while the pops and poplefts shrink the queue
+        count = max(1, min(ops, size // 2))
+        positions = [random.randrange(max(1, size - count)) for _ in range(count)]
+        result = {"size": size}
+
+        # old approach: list() copy, pop, rebuild the deque (what remove_selected did);
+        # fewer rounds on big queues, where each one is slow
+        old = deque(paths)
+        baseline = positions[:max(10, count * 10_000 // size)]
+        start = time.perf_counter()
+        for index in baseline:
+            queue_list = list(old)
+            queue_list.pop(index)
+            old = deque(queue_list)
+        result["deque_remove_us"] = (time.perf_counter() - start) / len(baseline) * 1e6
+
+        start = time.perf_counter()
+        new = TrackQueue(paths)
+        result["extend_ms"] = (time.perf_counter() - start) * 1e3
+
+        for name, op in (("getitem_us", lambda i: new[i]),
+                         ("window_us", lambda i: new[i:i + 50]),
+                         ("remove_us", lambda i: new.pop(i)),
+                         ("insert_us", lambda i: new.insert(i, paths[i])),
+                         ("move_us", lambda i: new.move(i, len(new) - 1 - i)),
+                         ("popleft_us", lambda i: new.popleft()),
+                         ("append_us", lambda i: new.append(paths[i]))):
+            start = time.perf_counter()
+            for index in positions:
+                op(index)
+            result[name] = (time.perf_counter() - start) / count * 1e6
+
+        print(f"{size:>8} tracks | deque remove {result['deque_remove_us']:10.1f} us"
+              f" | TrackQueue remove {result['remove_us']:8.1f} us"
+              f" | insert {result['insert_us']:8.1f} us | move {result['move_us']:8.1f} us")
+        results.append(result)
+    return results
+
+
+def benchmark_render(sizes):
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print("render | skipped:", e)
+        return {"skipped": str(e)}
+    root.geometry("800x600")
+    results = []
+    try:
+        app = MusicPlayerGUI(root, PlayerEngine(dummy_backend()))
+        root.update()
+        for size in sizes:
+            app.engine.clear_queue()
+            paths = [f"/music/track_{i:07d}.mp3" for i in range(size)]
+            start = time.perf_counter()
+            app.engine.enqueue(paths)
+            root.update()
+            result = {"size": size, "enqueue_ms": (time.perf_counter() - start) * 1e3}
+            for name, action in (("refresh_ms", lambda: app.update_queue_display()),
+                                 ("pop_front_ms", lambda: app.engine.dequeue()),
+                                 ("remove_at_ms", lambda: app.engine.dequeue(len(app.music_queue) // 2)),
+                                 ("append_batch_ms", lambda: app.engine.enqueue(paths[:1000]))):
+                start = time.perf_counter()
+                for _ in range(20):
+                    action()
+                    root.update_idletasks()
+                result[name] = (time.perf_counter() - start) * 1e3 / 20
+            start = time.perf_counter()
+            app.peek_queue()
+            root.update()
+            result["peek_ms"] = (time.perf_counter() - start) * 1e3
+            for window in root.winfo_children():
+                if isinstance(window, tk.Toplevel):
+                    window.destroy()
+            print(f"{size:>8} tracks | refresh {result['refresh_ms']:7.2f} ms | pop front {result['pop_front_ms']:7.2f} ms"
+                  f" | append 1000 {result['append_batch_ms']:7.2f} ms | peek {result['peek_ms']:7.2f} ms")
+            results.append(result)
+    finally:
+        root.destroy()
+    return results
+
+
+def benchmark_spinner(path="nailong.gif", size=(120, 120)):
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            frames = SpinnerFrames(path, size, cache_dir)
+            first = time.perf_counter()
+            frames.frame_image(0)
+            first_frame = time.perf_counter() - first
+            for i in range(1, len(frames)):
+                frames.frame_image(i)
+            total = time.perf_counter() - start
+            print(f"spinner {label:>4} | open {(first - start) * 1e3:7.2f} ms"
+                  f" | first frame {first_frame * 1e3:7.2f} ms | all {len(frames)} frames {total * 1e3:7.2f} ms")
+            results[label] = {"open_ms": (first - start) * 1e3, "first_frame_ms": first_frame * 1e3,
+                              "all_frames_ms": total * 1e3, "frames": len(frames)}
+    return results
+
+
+def benchmark_startup():
+    # a fresh interpreter each time, so nothing is warm but the OS file cache
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    code = f"import sys; sys.path.insert(0, {script_dir!r}); import MusicPlayerHehe"
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+    result = {"import_s": time.perf_counter() - start}
+    start = time.perf_counter()
+    backend = dummy_backend()
+    result["mixer_init_s"] = time.perf_counter() - start
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        result["gui_skipped"] = str(e)
+    else:
+        try:
+            start = time.perf_counter()
+            MusicPlayerGUI(root, PlayerEngine(backend))
+            root.update()
+            result["first_paint_s"] = time.perf_counter() - start
+        finally:
+            root.destroy()
+    backend.quit()
+    print("startup |", ", ".join(f"{key} {value:.3f}" if isinstance(value, float) else f"{key}: {value}"
+                                 for key, value in result.items()))
+    return result
+
+
+def benchmark_search(size=200_000, queries=("love", "track 1234", "ab", "e", "q", "remix 0199", "zzz")):
+    words = ["love", "night", "dance", "remix", "live", "blue", "summer", "heart", "road", "dream"]
+    paths = [f"/music/{words[i % 10]}/{words[(i * 7) % 10]} track {i:06d} remix {i % 997:04d}.mp3"
+             for i in range(size)]
+    index = SearchIndex()
+    result = {"size": size, "queries": {}}
+    start = time.perf_counter()
+    for path in paths:
+        index.add(path)
+    result["build_s"] = time.perf_counter() - start
+    print(f"search index | built {size} entries in {result['build_s']:.2f} s")
+    start = time.perf_counter()
+    index.scan(["warm"], 1)
+    result["join_ms"] = (time.perf_counter() - start) * 1e3
+    print(f"search index | joined texts for short queries in {result['join_ms']:.2f} ms")
+    for text in queries:
+        start = time.perf_counter()
+        matches = index.query(text)
+        elapsed = (time.perf_counter() - start) * 1e3
+        result["queries"][text] = {"ms": elapsed, "results": len(matches)}
+        print(f"search index | {text!r:>14} -> {len(matches):4d} results in {elapsed:6.2f} ms")
+    # a library scan batch landing between two keystrokes
+    for path in paths[5000:5500]:
+        index.update_text(path, search_text(path, ("Retitled", "Artist", "Album", None)))
+    start = time.perf_counter()
+    index.query("q")
+    result["short_after_update_ms"] = (time.perf_counter() - start) * 1e3
+    print(f"search index | short query after 500 metadata updates in {result['short_after_update_ms']:.2f} ms")
+    start = time.perf_counter()
+    for path in paths[:1000]:
+        index.discard(path)
+        index.add(path)
+    result["discard_add_ms"] = (time.perf_counter() - start) * 1e3 / 1000
+    print(f"search index | discard+add {result['discard_add_ms']:.3f} ms per entry")
+    return result
+
+
+def benchmark_loudness(tracks=32, seconds=5.0):
+    if not HAVE_NUMPY:
+        print("loudness | skipped: numpy is not installed")
+        return {"skipped": "numpy is not installed"}
+    import numpy as np
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for i in range(tracks + 1):
+            path = os.path.join(folder, f"noise_{i}.wav")
+            noise = (np.random.uniform(-1, 1, (int(44100 * seconds), 2)) * 3000 * (1 + i % 8)).astype(np.int16)
+            with wave.open(path, "wb") as w:
+                w.setnchannels(2)
+                w.setsampwidth(2)
+                w.setframerate(44100)
+                w.writeframes(noise.tobytes())
+            paths.append(path)
+        analyzer = LoudnessAnalyzer(os.path.join(folder, "loudness.sqlite3"))
+
+        def wait_for(count):
+            got = {}
+            while len(got) < count:
+                got.update(analyzer.drain())
+                time.sleep(0.005)
+            return got
+
+        analyzer.submit(paths[:1])   # start the worker processes outside the timing
+        wait_for(1)
+        start = time.perf_counter()
+        analyzer.submit(paths[1:])
+        wait_for(tracks)
+        elapsed = time.perf_counter() - start
+        analyzer.shutdown()
+    result = {"tracks": tracks, "seconds_each": seconds, "workers": os.cpu_count(),
+              "elapsed_s": elapsed, "tracks_per_s": tracks / elapsed}
+    print(f"loudness | {tracks} x {seconds:.0f} s tracks on {os.cpu_count()} workers:"
+          f" {result['tracks_per_s']:.1f} tracks/s")
+    return result
+
+
+def benchmark_duplicates(files=2000, size_kb=256, workers=None):
+    # Every fourth file is a copy of an earlier one with different tags.
+    # Hashes the same set cold with 1, 2, ... up to all cores.
+    counts = workers or sorted({min(count, os.cpu_count()) for count in (1, 2, 4, os.cpu_count())})
+    with tempfile.TemporaryDirectory() as folder:
+        payloads, paths = [], []
+        for i in range(files):
+            if i % 4 == 3:
+                payload = payloads[random.randrange(len(payloads))]
+            else:
+                payload = os.urandom(size_kb * 1024)
+                payloads.append(payload)
+            title = f"track {i}".encode()
+            id3 = b"ID3\x03\x00\x00" + bytes([0, 0, 0, len(title) + 11]) + b"TIT2" + struct.pack(">I", len(title) + 1) + b"\x00\x00\x00" + title
+            path = os.path.join(folder, f"{i:06d}.mp3")
+            with open(path, "wb") as f:
+                f.write(id3 + payload + b"TAG" + title.ljust(125, b"\x00"))
+            paths.append(path)
+        expected = files - len(payloads)
+        result = {"files": files, "size_kb": size_kb, "cores": os.cpu_count(), "runs": []}
+        for count in counts:
+            detector = DuplicateDetector(os.path.join(folder, f"hashes_{count}.sqlite3"), workers=count)
+            detector.submit(paths[:1])   # start the worker processes outside the timing
+            digests = {}
+            while not digests:
+                digests.update(detector.drain())
+                time.sleep(0.005)
+            start = time.perf_counter()
+            detector.submit(paths[1:])
+            while len(digests) < files:
+                digests.update(detector.drain())
+                time.sleep(0.005)
+            elapsed = time.perf_counter() - start
+            detector.shutdown()
+            duplicates = files - len(set(digests.values()))
+            if duplicates != expected:
+                raise AssertionError(f"found {duplicates} duplicates, expected {expected}")
+            run = {"workers": count, "elapsed_s": elapsed, "files_per_s": files / elapsed,
+                   "mb_per_s": files * size_kb / 1024 / elapsed}
+            result["runs"].append(run)
+            print(f"duplicates | {files} x {size_kb} KB on {count} workers: {run['files_per_s']:.0f} files/s,"
+                  f" {run['mb_per_s']:.0f} MB/s, {duplicates} duplicates")
+    return result
+
+
+def benchmark_track_switch(sizes, tracks=6, length=0.25):
+    # tests/test_track_switch.py holds the pass/fail bounds; these are the
+    # numbers to compare between releases
+    results = {"sizes": []}
+    with tempfile.TemporaryDirectory() as folder:
+        paths = silent_tracks(folder, tracks, length)
+        engine = PlayerEngine(dummy_backend())
+
+        # manual skips, through the same calls the NEXT button makes, at the
+        # head of queues of every size (the filler is never loaded)
+        for size in sizes:
+            engine.clear_queue()
+            engine.enqueue(paths + [f"/music/track_{i:07d}.mp3" for i in range(size - tracks)])
+            engine.play_next()
+            manual = []
+            for _ in range(tracks - 2):
+                start = time.perf_counter()
+                engine.next()
+                manual.append((time.perf_counter() - start) * 1e3)
+            engine.stop()
+            results["sizes"].append({"size": size, "next_ms": manual})
+            print(f"{size:>8} tracks | next() {sum(manual) / len(manual):6.2f} ms avg, {max(manual):6.2f} ms max")
+
+        # natural track ends: how long the poll() that sees the end event
+        # takes to catch the engine up, and the spacing of the changes
+        # (which includes the dummy driver's ~12 ms buffers)
+        engine.clear_queue()
+        changes, catch_up, polls = [], [], []
+
+        def on_event(event, data):
+            if event == "track_changed" and data["path"]:
+                changes.append(time.perf_counter())
+                catch_up.append((changes[-1] - polls[-1]) * 1e3 if polls else 0.0)
+        engine.subscribe(on_event)
+        engine.enqueue(paths)
+        engine.play_next()
+        while engine.is_playing:
+            polls.append(time.perf_counter())
+            engine.poll()
+            time.sleep(0.001)
+        lags = [((b - a) - length) * 1e3 for a, b in zip(changes, changes[1:])]
+        engine.shutdown()
+    results.update({"catch_up_ms": catch_up[1:], "end_interval_lag_ms": lags})
+    print(f"track switch | end-of-track catch-up {sum(catch_up[1:]) / max(1, len(catch_up) - 1):6.2f} ms avg"
+          f" | interval lag {sum(lags) / max(1, len(lags)):6.2f} ms avg, {max(lags, default=0):6.2f} ms max")
+    return results
+
+
+def benchmark_control(commands=10000):
+    engine = PlayerEngine(FakeBackend())
+    changes = []
+    engine.subscribe(lambda event, data: event == "queue_changed" and changes.append(data["change"]))
+    with tempfile.TemporaryDirectory() as folder:
+        address = os.path.join(folder, "control.sock") if hasattr(socket, "AF_UNIX") else "127.0.0.1:47801"
+        control = ControlServer(engine, address)
+        try:
+            control.start()
+        except OSError as e:
+            print("control | skipped:", e)
+            return {"skipped": str(e)}
+        stop = threading.Event()
+
+        def tk_thread():   # stands in for MusicPlayerGUI.poll_engine
+            while not stop.is_set():
+                engine.poll()
+                control.process()
+                time.sleep(0.01)
+        thread = threading.Thread(target=tk_thread, daemon=True)
+        thread.start()
+        client = ControlClient(address)
+        paths = [f"/music/track {i:05d}.mp3" for i in range(commands)]
+
+        # one enqueue per line, pipelined: how many queue refreshes they cost
+        start = time.perf_counter()
+        for path in paths:
+            client.send({"cmd": "enqueue", "paths": [path]})
+        for _ in paths:
+            client.receive()
+        pipelined = time.perf_counter() - start
+        pipelined_refreshes = len(changes)
+
+        # the same commands as one batched line
+        changes.clear()
+        start = time.perf_counter()
+        client.batch({"cmd": "enqueue", "paths": [path]} for path in paths)
+        batched = time.perf_counter() - start
+        batched_refreshes = len(changes)
+
+        # round trips, each waiting for a Tk tick
+        start = time.perf_counter()
+        for _ in range(50):
+            client.call("status")
+        round_trip = (time.perf_counter() - start) / 50
+        client.close()
+        stop.set()
+        thread.join()
+        control.close()
+    result = {"commands": commands, "pipelined_per_s": commands / pipelined, "pipelined_refreshes": pipelined_refreshes,
+              "batched_per_s": commands / batched, "batched_refreshes": batched_refreshes,
+              "round_trip_ms": round_trip * 1e3}
+    print(f"control | {commands} enqueues pipelined: {result['pipelined_per_s']:9.0f}/s, {pipelined_refreshes} refreshes"
+          f" | batched: {result['batched_per_s']:9.0f}/s, {batched_refreshes} refreshes"
+          f" | round trip {result['round_trip_ms']:.1f} ms")
+    return result
+
+
+def benchmark_shuffle(size=1_000_000, steps=2000, trials=20000):
+    engine = PlayerEngine(FakeBackend())
+    engine.set_shuffle("random")
+    engine.enqueue(f"/music/track_{i:07d}.mp3" for i in range(size))
+    # per-step cost of drawing and removing the next track, as play_next() does
+    start = time.perf_counter()
+    for _ in range(steps):
+        engine.dequeue(engine.next_index())
+    step_us = (time.perf_counter() - start) / steps * 1e6
+
+    # fairness: from 8 tracks, each should be drawn first 1/8 of the time,
+    # including the ones appended after the first draw
+    paths = [f"/music/{i}.mp3" for i in range(8)]
+    counts = [0] * len(paths)
+    for _ in range(trials):
+        engine = PlayerEngine(FakeBackend())
+        engine.set_shuffle("random")
+        engine.enqueue(paths[:4])
+        engine.next_index()
+        engine.enqueue(paths[4:])
+        counts[paths.index(engine.music_queue[engine.next_index()])] += 1
+    expected = trials / len(counts)
+    chi_square = sum((count - expected) ** 2 / expected for count in counts)
+    result = {"size": size, "step_us": step_us, "first_pick_counts": counts, "chi_square_7dof": chi_square}
+    print(f"shuffle | {size} tracks: {step_us:6.2f} us/step | first picks {counts}, chi-square {chi_square:.1f}"
+          f" (7 dof, 14.1 at p=0.05)")
+    return result
+
+
+def benchmark_audio_cache(tracks=4, length=30.0):
+    # start latency streaming from disk vs playing an already decoded track
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    try:
+        backend = PygameBackend(cache_bytes=int(tracks * length * 44100 * 4 * 1.5))
+    except Exception as e:
+        print("audio cache | skipped:", e)
+        return {"skipped": str(e)}
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for i in range(tracks):
+            path = os.path.join(folder, f"noise_{i}.wav")
+            with wave.open(path, "wb") as w:
+                w.setnchannels(2)
+                w.setsampwidth(2)
+                w.setframerate(44100)
+                w.writeframes(os.urandom(int(44100 * length) * 4))
+            paths.append(path)
+        engine = PlayerEngine(backend)
+        cold = []
+        for path in paths:
+            start = time.perf_counter()
+            engine.start(path)
+            cold.append((time.perf_counter() - start) * 1e3)
+        deadline = time.perf_counter() + 10
+        while backend.cache.stats()["tracks"] < tracks and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        warm = []
+        for path in paths:
+            start = time.perf_counter()
+            engine.start(path)
+            warm.append((time.perf_counter() - start) * 1e3)
+        engine.stop()
+        stats = engine.cache_stats()
+        engine.shutdown()
+    result = {"stream_start_ms": cold, "cached_start_ms": warm, "cache": stats}
+    print(f"audio cache | start from disk {sum(cold) / len(cold):6.2f} ms avg"
+          f" | from cache {sum(warm) / len(warm):6.2f} ms avg | {stats['mb']:.0f} MB held")
+    return result
+
+
+def run_benchmarks(sizes, out_path):
+    import pygame
+    results = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "pygame": pygame.version.ver, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "queue": benchmark_queue(sizes, ops=100),
+        "render": benchmark_render(sizes),
+        "spinner": benchmark_spinner(os.path.join(os.path.dirname(os.path.abspath(__file__)), "nailong.gif")),
+        "startup": benchmark_startup(),
+        "search": benchmark_search(),
+        "loudness": benchmark_loudness(),
+        "duplicates": benchmark_duplicates(),
+        "control": benchmark_control(),
+        "shuffle": benchmark_shuffle(),
+        "track_switch": benchmark_track_switch(sizes),
+        "audio_cache": benchmark_audio_cache(),
+    }
+    with open(out_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print("results written to", out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MusicPlayerHehe benchmark suite")
+    parser.add_argument("--out", default="benchmark.json", help="where to write the JSON results")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="comma-separated queue sizes for the queue and render benchmarks")
+    args = parser.parse_args()
+    run_benchmarks([int(size) for size in args.sizes.split(",")], args.out)
+
+
+if __name__ == "__main__":
+    main()
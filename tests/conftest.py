@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MusicPlayerHehe  # noqa: E402
+
+
+@pytest.fixture
+def tracks(tmp_path):
+    # FakeBackend only checks that a file exists
+    def make(count, prefix="track"):
+        paths = []
+        for i in range(count):
+            path = tmp_path / f"{prefix}_{i:04d}.mp3"
+            path.touch()
+            paths.append(str(path))
+        return paths
+    return make
+
+
+@pytest.fixture
+def engine():
+    return MusicPlayerHehe.PlayerEngine(MusicPlayerHehe.FakeBackend())
@@ -0,0 +1,171 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+from MusicPlayerHehe import ControlClient, ControlError, ControlServer, parse_control_address
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+
+class PollThread:
+    # stands in for MusicPlayerGUI.poll_engine; hold lock to pause it
+    def __init__(self, engine, control):
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(engine, control), daemon=True)
+        self.thread.start()
+
+    def run(self, engine, control):
+        while not self.stopped.is_set():
+            with self.lock:
+                engine.poll()
+                control.process()
+            time.sleep(0.01)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+@pytest.fixture
+def control(engine):
+    # not tmp_path: Unix socket paths are limited to ~100 characters
+    with tempfile.TemporaryDirectory() as folder:
+        control = ControlServer(engine, os.path.join(folder, "control.sock"))
+        control.start()
+        control.poller = PollThread(engine, control)
+        yield control
+        control.poller.stop()
+        control.close()
+        assert not os.path.exists(control.address)
+
+
+@pytest.fixture
+def client(control):
+    client = ControlClient(control.address, timeout=5)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def changes(engine):
+    changes = []
+    engine.subscribe(lambda event, data: event == "queue_changed" and changes.append(data["change"]))
+    return changes
+
+
+def test_commands_run_on_the_poll_thread(engine, client):
+    assert client.call("enqueue", paths=["/music/a.mp3", "/music/b.mp3"]) == {"queued": 2}
+    assert client.call("list") == ["/music/a.mp3", "/music/b.mp3"]
+    assert client.call("remove", index=0) == "/music/a.mp3"
+    assert client.call("status")["queued"] == 1
+    assert client.batch([{"cmd": "clear"}, {"cmd": "status"}])[1]["queued"] == 0
+    assert list(engine.music_queue) == []
+
+
+def test_pipelined_enqueues_cost_one_queue_refresh(engine, control, client, changes):
+    paths = [f"/music/track {i:04d}.mp3" for i in range(500)]
+    with control.poller.lock:
+        for path in paths:
+            client.send({"cmd": "enqueue", "paths": [path]})
+        client.file.flush()
+        deadline = time.monotonic() + 5
+        while control.commands.qsize() < len(paths):
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+    assert [client.receive() for _ in paths] == [{"ok": True, "result": {"queued": 1}}] * len(paths)
+    assert changes == ["append_batch"]
+    assert list(engine.music_queue) == paths
+
+
+def test_other_commands_keep_their_place_between_enqueues(engine, control, client, changes):
+    with control.poller.lock:
+        client.send([{"cmd": "enqueue", "paths": ["/a.mp3"]}, {"cmd": "enqueue", "paths": ["/b.mp3"]},
+                     {"cmd": "status"}, {"cmd": "enqueue", "paths": ["/c.mp3"]}])
+        client.file.flush()
+        deadline = time.monotonic() + 5
+        while control.commands.qsize() < 4:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+    queued = [response["result"] for response in client.receive()]
+    assert queued[2]["queued"] == 2
+    assert changes == ["append_batch", "append_batch"]
+    assert list(engine.music_queue) == ["/a.mp3", "/b.mp3", "/c.mp3"]
+
+
+@pytest.mark.parametrize("line, error", [
+    (b"{not json\n", "invalid JSON"),
+    (b"5\n", "a command must be a JSON object"),
+    (b'[{"cmd": "status"}, "status"]\n', "a command must be a JSON object"),
+    (b'{"cmd": "dance"}\n', "unknown command: 'dance'"),
+    (b'{"cmd": "enqueue", "paths": "/a.mp3"}\n', "enqueue needs a list of paths"),
+    (b'{"cmd": "remove"}\n', "missing argument 'index'"),
+    (b'{"cmd": "remove", "index": 3}\n', "no queue entry 3"),
+    (b'{"cmd": "volume", "value": "loud"}\n', "could not convert"),
+])
+def test_bad_requests_get_an_error_and_the_connection_stays_up(client, line, error):
+    client.sock.sendall(line)
+    response = client.receive()
+    if isinstance(response, list):
+        assert response[0]["ok"]
+        response = response[1]
+    assert response["ok"] is False
+    assert error in response["error"]
+    assert client.call("status")["queued"] == 0
+
+
+def test_client_raises_control_errors(client):
+    with pytest.raises(ControlError, match="unknown command"):
+        client.call("dance")
+
+
+def test_subscribers_get_engine_events(control, client):
+    other = ControlClient(control.address, timeout=5)
+    try:
+        assert other.call("subscribe") is None
+        client.call("enqueue", paths=["/music/a.mp3"])
+        assert json.loads(other.file.readline()) == {"event": "queue_changed", "change": "append_batch", "length": 1}
+        assert client.call("status")["queued"] == 1   # only subscribers get events
+    finally:
+        other.close()
+
+
+def test_tcp_stays_on_loopback():
+    assert parse_control_address("127.0.0.1:47800") == (socket.AF_INET, ("127.0.0.1", 47800))
+    assert parse_control_address(":47800") == (socket.AF_INET, ("127.0.0.1", 47800))
+    assert parse_control_address("localhost:47800")[0] == socket.AF_INET
+    for host in ("0.0.0.0", "192.168.1.5", "example.com"):
+        with pytest.raises(OSError, match="only listens on localhost"):
+            parse_control_address(f"{host}:47800")
+    assert parse_control_address("/tmp/player.sock") == (socket.AF_UNIX, "/tmp/player.sock")
+
+
+def test_a_second_server_on_the_same_socket_is_refused(engine, control):
+    with pytest.raises(OSError, match="already listening"):
+        ControlServer(engine, control.address).start()
+    client = ControlClient(control.address, timeout=5)
+    assert client.call("status")["queued"] == 0
+    client.close()
+
+
+def test_stale_socket_file_is_replaced(engine):
+    with tempfile.TemporaryDirectory() as folder:
+        address = os.path.join(folder, "control.sock")
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(address)
+        stale.close()
+        control = ControlServer(engine, address)
+        control.start()
+        poller = PollThread(engine, control)
+        try:
+            client = ControlClient(address, timeout=5)
+            assert client.call("status")["queued"] == 0
+            client.close()
+        finally:
+            poller.stop()
+            control.close()
@@ -0,0 +1,216 @@
+import struct
+
+import pytest
+
+from MusicPlayerHehe import FakeBackend, PlayerEngine, audio_payload, hash_audio
+
+AUDIO = bytes([0xFF, 0xFB, 0x90, 0x00]) + bytes(range(256)) * 8
+
+
+class FakeHasher:
+    # hands the engine injected digests, only for released paths
+    def __init__(self, digests):
+        self.digests = digests
+        self.submitted = set()
+        self.ready = {}
+
+    def submit(self, paths):
+        self.submitted.update(paths)
+
+    def release(self, paths=None):
+        for path in self.submitted if paths is None else paths:
+            if path in self.digests:
+                self.ready[path] = self.digests[path]
+
+    def drain(self):
+        ready, self.ready = self.ready, {}
+        return ready
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def paths(tracks):
+    return dict(zip("abcdx", tracks(5)))
+
+
+@pytest.fixture
+def hasher(paths):
+    # a, b and c hold the same audio; d and x are unique
+    return FakeHasher({paths["a"]: "same", paths["b"]: "same", paths["c"]: "same", paths["d"]: "other"})
+
+
+@pytest.fixture
+def engine(hasher):
+    engine = PlayerEngine(FakeBackend(), hasher=hasher)
+    engine.changed = []
+    engine.subscribe(lambda event, data: event == "metadata_changed" and engine.changed.extend(data["paths"]))
+    return engine
+
+
+def hashed(engine, paths=None):
+    engine.hasher.release(paths)
+    engine.poll()
+
+
+def play_all(engine):
+    played = []
+    while engine.play_next():
+        played.append(engine.current_song)
+    return played
+
+
+def test_copies_of_the_audio_are_flagged_against_the_first_added(engine, paths):
+    a, b, c, d = paths["a"], paths["b"], paths["c"], paths["d"]
+    engine.enqueue([b, d, a])
+    engine.enqueue([c])
+    # the hash of the first added arriving last doesn't change the original
+    hashed(engine, [a, c])
+    hashed(engine, [b, d])
+    assert engine.duplicates == {a: b, c: b}
+    assert set(engine.changed) == {a, c}
+
+
+@pytest.mark.parametrize("shuffle", ["off", "random"])
+def test_skip_plays_one_copy_and_leaves_the_rest_queued(engine, paths, shuffle):
+    a, b, c, d, x = paths["a"], paths["b"], paths["c"], paths["d"], paths["x"]
+    engine.set_shuffle(shuffle)
+    engine.set_skip_duplicates(True)
+    engine.enqueue([a, d, b, x, c])
+    hashed(engine)
+    played = play_all(engine)
+    assert sorted(played) == sorted([a, d, x])
+    assert sorted(engine.music_queue) == sorted([b, c])
+
+
+def test_without_skip_flagged_tracks_still_play(engine, paths):
+    engine.enqueue(list(paths.values()) + [paths["x"]])
+    hashed(engine)
+    assert len(engine.duplicates) == 3
+    assert play_all(engine) == list(paths.values()) + [paths["x"]]
+
+
+@pytest.mark.parametrize("shuffle", ["off", "random"])
+def test_the_same_path_queued_twice_plays_once(engine, paths, shuffle):
+    # adding a folder twice; no hash needed
+    a, x = paths["a"], paths["x"]
+    engine.set_shuffle(shuffle)
+    engine.set_skip_duplicates(True)
+    engine.enqueue([x, a])
+    engine.enqueue([x, a])
+    assert engine.duplicates == {x: x, a: a}
+    assert sorted(play_all(engine)) == sorted([x, a])
+    assert sorted(engine.music_queue) == sorted([x, a])
+
+
+def test_a_played_track_added_again_is_a_duplicate(engine, paths):
+    a, b, x = paths["a"], paths["b"], paths["x"]
+    engine.set_skip_duplicates(True)
+    engine.enqueue([b, x])
+    hashed(engine)
+    assert engine.play_next()
+    engine.enqueue([a, b])
+    hashed(engine)
+    assert engine.duplicates == {a: b, b: b}
+    assert play_all(engine) == [x]
+
+
+def test_played_before_the_hash_came_in(engine, paths):
+    a, b, x = paths["a"], paths["b"], paths["x"]
+    engine.enqueue([b, x, a])
+    engine.play_next()
+    hashed(engine)
+    assert engine.duplicates == {a: b}
+
+
+def test_flags_go_with_their_queue_entries(engine, paths):
+    a, b, c, x = paths["a"], paths["b"], paths["c"], paths["x"]
+    engine.enqueue([a, b, x, c, x])
+    hashed(engine)
+    assert engine.duplicates == {b: a, c: a, x: x}
+    engine.changed.clear()
+    engine.dequeue(0)
+    assert engine.duplicates == {c: b, x: x}
+    engine.dequeue(1)
+    assert engine.duplicates == {c: b}
+    engine.dequeue(0)
+    assert engine.duplicates == {}
+    assert set(engine.changed) == {b, c, x}
+    engine.enqueue([a, a])
+    assert engine.duplicates == {a: c}
+    engine.changed.clear()
+    engine.clear_queue()
+    assert engine.duplicates == {}
+    assert engine.changed == [a]
+    engine.enqueue([b])
+    assert engine.duplicates == {}
+    assert play_all(engine) == [b]
+
+
+def test_repeat_all_plays_one_copy_per_round(engine, paths):
+    a, b, d, x = paths["a"], paths["b"], paths["d"], paths["x"]
+    engine.set_repeat("all")
+    engine.set_skip_duplicates(True)
+    engine.enqueue([a, x, b, d, x])
+    hashed(engine)
+    rounds = []
+    for _ in range(4):
+        played = []
+        for _ in range(3):
+            assert engine.play_next()
+            played.append(engine.current_song)
+        rounds.append(played)
+    assert rounds[0] == [a, x, d]
+    for played in rounds:
+        # a and b hold the same audio; either may open a later round
+        assert [b if path == a else path for path in played] == [b, x, d]
+
+
+def syncsafe(size):
+    return bytes([size >> 21 & 0x7F, size >> 14 & 0x7F, size >> 7 & 0x7F, size & 0x7F])
+
+
+def id3v2(body, footer=False):
+    return b"ID3\x04\x00" + bytes([0x10 if footer else 0]) + syncsafe(len(body)) + body + (
+        b"3DI\x04\x00\x10" + syncsafe(len(body)) if footer else b"")
+
+
+def id3v1():
+    return b"TAG" + b"title".ljust(125, b"\0")
+
+
+def apev2(items, header=True):
+    flags = 0x80000000 if header else 0
+    size = len(items) + 32
+    preamble = b"APETAGEX" + struct.pack("<IIII", 2000, size, 1, flags) + b"\0" * 8
+    return (preamble if header else b"") + items + preamble
+
+
+@pytest.mark.parametrize("front, back", [
+    (b"", b""),
+    (id3v2(b"\x01" * 300), b""),
+    (id3v2(b"\x02" * 200, footer=True), b""),
+    (id3v2(b"\x03" * 50) + id3v2(b"\x04" * 70, footer=True), b""),
+    (b"", id3v1()),
+    (b"", apev2(b"\x05" * 40)),
+    (b"", apev2(b"\x06" * 40, header=False)),
+    (id3v2(b"\x07" * 90, footer=True), apev2(b"\x08" * 40) + id3v1()),
+])
+def test_audio_payload_leaves_out_the_tags(front, back):
+    data = front + AUDIO + back
+    start, end = audio_payload(data)
+    assert data[start:end] == AUDIO
+
+
+def test_retagged_copies_hash_the_same(tmp_path):
+    digests = set()
+    for i, (front, back) in enumerate([(b"", b""), (id3v2(b"\x09" * 500, footer=True), id3v1()),
+                                       (id3v2(b"\x0A" * 10), apev2(b"\x0B" * 64))]):
+        path = tmp_path / f"{i}.mp3"
+        path.write_bytes(front + AUDIO + back)
+        digests.add(hash_audio(str(path))[2])
+    assert len(digests) == 1 and None not in digests
+    only_tags = tmp_path / "tags.mp3"
+    only_tags.write_bytes(id3v2(b"\x0C" * 20) + id3v1())
+    assert hash_audio(str(only_tags))[2] is None
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import MusicPlayerHehe as m
+from MusicPlayerHehe import FolderImporter
+
+
+def write(path, head):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(head + b"\0" * 16)
+    return str(path)
+
+
+def collect(importer, timeout=10):
+    batches = []
+    deadline = time.monotonic() + timeout
+    while not importer.finished():
+        assert time.monotonic() < deadline
+        batch = importer.drain(1)
+        if batch:
+            batches.append(batch)
+        else:
+            time.sleep(0.001)
+    return batches
+
+
+def test_finds_audio_in_nested_folders(tmp_path):
+    expected = {write(tmp_path / "a" / "b" / f"{i}.mp3", b"ID3") for i in range(3)}
+    expected.add(write(tmp_path / "song.ogg", b"OggS"))
+    write(tmp_path / "cover.jpg", b"ID3")            # wrong extension
+    write(tmp_path / "a" / "fake.mp3", b"<html>")    # right extension, not audio
+    importer = FolderImporter(str(tmp_path))
+    importer.start()
+    batches = collect(importer)
+    assert {path for batch in batches for path in batch} == expected
+    assert importer.found == len(expected)
+    assert importer.scanned_dirs == 3
+
+
+def test_flat_folder_streams_sorted_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(FolderImporter, "BATCH_SIZE", 10)
+    expected = [write(tmp_path / f"{i:03d}.mp3", b"ID3") for i in range(95)]
+    importer = FolderImporter(str(tmp_path), workers=4)
+    importer.start()
+    batches = collect(importer)
+    assert len(batches) == 10
+    assert all(batch == sorted(batch) for batch in batches)
+    assert sorted(path for batch in batches for path in batch) == expected
+
+
+def test_batches_arrive_while_other_files_are_still_being_sniffed(tmp_path, monkeypatch):
+    # one file stuck on a slow disk must not hold back the rest of its folder
+    monkeypatch.setattr(FolderImporter, "BATCH_SIZE", 10)
+    paths = [write(tmp_path / f"{i:03d}.mp3", b"ID3") for i in range(50)]
+    release = threading.Event()
+    sniff_audio = m.sniff_audio
+    monkeypatch.setattr(m, "sniff_audio", lambda path: (path != paths[25] or release.wait(10)) and sniff_audio(path))
+    importer = FolderImporter(str(tmp_path), workers=4)
+    importer.start()
+    deadline = time.monotonic() + 5
+    while not importer.results.qsize() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    streamed = importer.results.qsize()
+    release.set()
+    assert streamed
+    assert sorted(path for batch in collect(importer) for path in batch) == paths
+
+
+def test_cancel_stops_the_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(FolderImporter, "BATCH_SIZE", 10)
+    for i in range(200):
+        write(tmp_path / f"{i:03d}.mp3", b"ID3")
+    importer = FolderImporter(str(tmp_path), workers=1)
+    importer.cancel()
+    importer.start()
+    assert collect(importer) == []
+    assert importer.done.is_set()
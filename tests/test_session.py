@@ -0,0 +1,108 @@
+import os
+import random
+
+import pytest
+
+from MusicPlayerHehe import FakeBackend, PlayerEngine, QueueSession, expand_paths, read_m3u, write_m3u
+
+
+def restore(path):
+    # a fresh engine replaying the journal a previous run left behind
+    engine = PlayerEngine(FakeBackend())
+    session = QueueSession(engine, path)
+    loader = session.restore()
+    loader.read()
+    engine.enqueue(loader.drain(10 ** 6))
+    session.finish_restore()
+    return engine, session
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "state" / "session.txt")
+
+
+def test_replay_rebuilds_the_queue(engine, tracks, journal):
+    paths = tracks(40)
+    session = QueueSession(engine, journal)
+    session.restore()
+    engine.enqueue(paths[:20])
+    engine.dequeue(5)
+    engine.insert(0, paths[30])
+    engine.insert(7, paths[31])
+    engine.play_next()
+    engine.dequeue(len(engine.music_queue) - 1)
+    engine.clear_queue()
+    engine.enqueue(paths[20:30])
+    engine.insert(3, paths[35])
+    engine.dequeue(0)
+    engine.enqueue(paths[:2])
+    session.close()
+
+    restored, restored_session = restore(journal)
+    assert list(restored.music_queue) == list(engine.music_queue)
+    assert restored_session.current == (engine.current_song, 0.0)
+    assert not os.path.exists(journal + ".old")
+
+
+def test_replay_matches_random_edits_across_restarts(tracks, journal):
+    rng = random.Random(7)
+    paths = tracks(50)
+    engine, session = restore(journal)
+    for run in range(3):
+        for _ in range(200):
+            op = rng.random()
+            if op < 0.4 or not engine.music_queue:
+                engine.enqueue(rng.sample(paths, rng.randrange(1, 5)))
+            elif op < 0.7:
+                engine.dequeue(rng.randrange(len(engine.music_queue)))
+            elif op < 0.95:
+                engine.insert(rng.randrange(len(engine.music_queue) + 1), rng.choice(paths))
+            else:
+                engine.clear_queue()
+        expected = list(engine.music_queue)
+        session.close()
+        engine, session = restore(journal)
+        assert list(engine.music_queue) == expected
+    session.close()
+
+
+def test_unfinished_restore_is_replayed_again(engine, tracks, journal):
+    paths = tracks(5)
+    session = QueueSession(engine, journal)
+    session.restore()
+    engine.enqueue(paths)
+    session.close()
+    # quit before finish_restore(): the .old journal must survive
+    QueueSession(PlayerEngine(FakeBackend()), journal).restore().read()
+    restored, _ = restore(journal)
+    assert list(restored.music_queue) == paths
+
+
+def test_m3u_round_trip(tmp_path, tracks):
+    paths = tracks(3) + [str(tmp_path / "ünïcode name.mp3"), str(tmp_path / "sub" / "deeper.ogg")]
+    playlist = str(tmp_path / "list.m3u8")
+    write_m3u(playlist, paths)
+    assert list(read_m3u(playlist)) == paths
+
+
+def test_m3u_resolves_relative_entries_and_skips_urls(tmp_path):
+    playlist = tmp_path / "lists" / "mix.m3u"
+    playlist.parent.mkdir()
+    playlist.write_text("#EXTM3U\n#EXTINF:12,Some Song\n../music/a.mp3\n\nhttp://radio/stream\n"
+                        f"{tmp_path / 'b.mp3'}\n", encoding="utf-8")
+    assert list(read_m3u(str(playlist))) == [str(tmp_path / "music" / "a.mp3"), str(tmp_path / "b.mp3")]
+
+
+def test_expand_paths_walks_folders_and_playlists_lazily(tmp_path, monkeypatch):
+    for name in ("b.mp3", "a.wav", "notes.txt", os.path.join("sub", "c.ogg")):
+        (tmp_path / "music" / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / "music" / name).touch()
+    (tmp_path / "list.m3u").write_text("music/b.mp3\n")
+    monkeypatch.chdir(tmp_path)
+    files = expand_paths(["music", "list.m3u", "loose.mp3"])
+    assert not isinstance(files, list)
+    music = str(tmp_path / "music")
+    assert list(files) == [os.path.join(music, "a.wav"), os.path.join(music, "b.mp3"),
+                           os.path.join(music, "sub", "c.ogg"), os.path.join(music, "b.mp3"),
+                           str(tmp_path / "loose.mp3")]
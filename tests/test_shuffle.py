@@ -0,0 +1,150 @@
+import itertools
+import random
+from collections import Counter
+
+import pytest
+
+import MusicPlayerHehe as m
+
+# chi-square critical values at p = 0.001
+CHI2_CRITICAL = {5: 20.52, 7: 24.32}
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(1234)
+
+
+def chi_square(counts, outcomes, trials):
+    expected = trials / len(outcomes)
+    return sum((counts[outcome] - expected) ** 2 / expected for outcome in outcomes)
+
+
+def pick_counts(engine, start, change, trials=4000):
+    # where the shuffle pick ends up after a queue change, by path
+    counts = Counter()
+    for _ in range(trials):
+        engine.clear_queue()
+        engine.enqueue(start)
+        engine.next_index()
+        change(engine)
+        counts[engine.music_queue[engine.next_index()]] += 1
+    return counts
+
+
+@pytest.mark.parametrize("change, size", [
+    ("append", 4),
+    ("append_one", 7),
+    ("insert_front", 7),
+    ("insert_middle", 7),
+    ("remove_front", 9),
+    ("remove_middle", 9),
+    ("remove_last", 9),
+])
+def test_pick_stays_uniform_across_queue_changes(engine, tracks, change, size):
+    paths = tracks(9)
+    extra = tracks(4, "extra")
+    changes = {
+        "append": lambda e: e.enqueue(extra),
+        "append_one": lambda e: e.enqueue(extra[:1]),
+        "insert_front": lambda e: e.insert(0, extra[0]),
+        "insert_middle": lambda e: e.insert(3, extra[0]),
+        "remove_front": lambda e: e.dequeue(0),
+        "remove_middle": lambda e: e.dequeue(4),
+        "remove_last": lambda e: e.dequeue(8),
+    }
+    engine.set_shuffle("random")
+    trials = 4000
+    counts = pick_counts(engine, paths[:size], changes[change], trials)
+    outcomes = list(engine.music_queue)
+    assert len(outcomes) == 8
+    assert set(counts) <= set(outcomes)
+    assert chi_square(counts, outcomes, trials) < CHI2_CRITICAL[7]
+
+
+def test_every_order_is_equally_likely(engine, tracks):
+    paths = tracks(3)
+    engine.set_shuffle("random")
+    trials = 6000
+    counts = Counter()
+    for _ in range(trials):
+        engine.clear_queue()
+        engine.enqueue(paths)
+        order = []
+        while engine.play_next():
+            order.append(engine.current_song)
+        counts[tuple(order)] += 1
+    outcomes = list(itertools.permutations(paths))
+    assert set(counts) == set(outcomes)
+    assert chi_square(counts, outcomes, trials) < CHI2_CRITICAL[5]
+
+
+def test_shuffle_step_leaves_the_rest_of_the_queue_alone(engine, tracks, monkeypatch):
+    # no reordering and one random draw per track, whatever the queue size
+    paths = tracks(2000)
+    engine.set_shuffle("random")
+    engine.enqueue(paths)
+    draws = []
+    randrange = m.random.randrange
+    monkeypatch.setattr(m.random, "randrange", lambda *args: draws.append(args) or randrange(*args))
+    played = []
+    for _ in range(100):
+        assert engine.play_next()
+        played.append(engine.current_song)
+    assert len(draws) == 100
+    assert len(set(played)) == 100
+    assert list(engine.music_queue) == [path for path in paths if path not in set(played)]
+
+
+@pytest.mark.parametrize("shuffle", m.PlayerEngine.SHUFFLE_MODES)
+def test_repeat_all_plays_each_track_once_per_round(engine, tracks, shuffle):
+    paths = tracks(5)
+    engine.set_shuffle(shuffle)
+    engine.set_repeat("all")
+    engine.enqueue(paths)
+    played = []
+    for _ in range(6 * len(paths)):
+        assert engine.play_next()
+        played.append(engine.current_song)
+    for start in range(0, len(played), len(paths)):
+        assert sorted(played[start:start + len(paths)]) == paths
+    if shuffle == "off":
+        assert played[:len(paths)] == paths
+
+
+def test_repeat_one_replays_without_touching_the_queue(engine, tracks):
+    paths = tracks(3)
+    engine.set_repeat("one")
+    engine.enqueue(paths)
+    engine.play_next()
+    for _ in range(3):
+        engine.on_track_end()
+        assert engine.current_song == paths[0]
+    assert list(engine.music_queue) == paths[1:]
+
+
+def test_clear_stays_cleared_under_repeat_all(engine, tracks):
+    engine.set_repeat("all")
+    engine.set_shuffle("random")
+    engine.enqueue(tracks(3))
+    engine.play_next()
+    engine.play_next()
+    engine.clear_queue()
+    assert len(engine.music_queue) == 0
+    assert engine.repeat_pool == []
+    assert engine.shuffle_pick is None
+
+
+def test_previous_keeps_one_copy_per_round_under_repeat_all(engine, tracks):
+    a, c = tracks(2)
+    engine.set_repeat("all")
+    engine.enqueue([a, c])
+    engine.play_next()
+    engine.play_next()
+    assert engine.previous()
+    assert engine.current_song == a
+    played = []
+    for _ in range(6):
+        assert engine.play_next()
+        played.append(engine.current_song)
+    assert played == [c, a, c, a, c, a]
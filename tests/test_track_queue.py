@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from MusicPlayerHehe import TrackQueue
+
+
+@pytest.fixture(params=[4, TrackQueue.CHUNK_SIZE], ids=["tiny_chunks", "default_chunks"])
+def chunk_size(request, monkeypatch):
+    # tiny chunks make splits and emptied chunks happen every few operations
+    monkeypatch.setattr(TrackQueue, "CHUNK_SIZE", request.param)
+    return request.param
+
+
+def check(queue, expected):
+    assert len(queue) == len(expected)
+    assert list(queue) == expected
+    assert queue[:] == expected
+    for index in (0, len(expected) // 2, -1) if expected else ():
+        assert queue[index] == expected[index]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_list_under_random_operations(chunk_size, seed):
+    rng = random.Random(seed)
+    queue, expected = TrackQueue(), []
+    counter = 0
+    for _ in range(3000):
+        op = rng.choice(["append", "extend", "insert", "pop", "popleft", "move", "getitem", "slice", "index"])
+        if op == "append":
+            queue.append(counter)
+            expected.append(counter)
+            counter += 1
+        elif op == "extend":
+            # now and then enough to span several chunks
+            items = list(range(counter, counter + rng.randrange(chunk_size * 3 if rng.random() < 0.1 else 5)))
+            counter += len(items)
+            queue.extend(items)
+            expected.extend(items)
+        elif op == "insert":
+            index = rng.randrange(-len(expected) - 2, len(expected) + 3)
+            queue.insert(index, counter)
+            expected.insert(index, counter)
+            counter += 1
+        elif not expected:
+            continue
+        elif op == "pop":
+            index = rng.randrange(-len(expected), len(expected))
+            assert queue.pop(index) == expected.pop(index)
+        elif op == "popleft":
+            assert queue.popleft() == expected.pop(0)
+        elif op == "move":
+            src = rng.randrange(len(expected))
+            dst = rng.randrange(len(expected))
+            item = expected.pop(src)
+            expected.insert(dst, item)
+            assert queue.move(src, dst) == item
+        elif op == "getitem":
+            index = rng.randrange(-len(expected), len(expected))
+            assert queue[index] == expected[index]
+        elif op == "slice":
+            start = rng.randrange(-len(expected) - 2, len(expected) + 2)
+            stop = rng.randrange(-len(expected) - 2, len(expected) + 2)
+            step = rng.choice([None, 1, 2, -1])
+            assert queue[start:stop:step] == expected[start:stop:step]
+            assert list(queue.islice(max(0, start), max(0, stop))) == expected[max(0, start):max(0, stop)]
+        elif op == "index":
+            item = rng.choice(expected)
+            assert queue.index(item) == expected.index(item)
+        if rng.random() < 0.02:
+            check(queue, expected)
+    check(queue, expected)
+    queue.clear()
+    check(queue, [])
+
+
+def test_errors_match_list(chunk_size):
+    queue = TrackQueue(range(10))
+    for index in (10, -11):
+        with pytest.raises(IndexError):
+            queue[index]
+        with pytest.raises(IndexError):
+            queue.pop(index)
+    with pytest.raises(ValueError):
+        queue.index("missing")
+    queue.clear()
+    with pytest.raises(IndexError):
+        queue.pop()
+    with pytest.raises(IndexError):
+        queue.popleft()